@@ -1,4 +1,7 @@
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TLRUCache
+import asyncio
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -6,16 +9,28 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from database import get_db
 from models import Patient, Insurer
-import os
-from dotenv import load_dotenv
+from config import settings
+import threading
+import time
 
-load_dotenv()
+SECRET_KEY = settings.secret_key
+ALGORITHM = settings.algorithm
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
+PRINCIPAL_CACHE_SIZE = settings.principal_cache_size
+PRINCIPAL_CACHE_TTL = settings.principal_cache_ttl
+BCRYPT_ROUNDS = settings.bcrypt_rounds
+PASSWORD_HASH_WORKERS = settings.password_hash_workers
+PASSWORD_HASH_QUEUE_SIZE = settings.password_hash_queue_size
 
-SECRET_KEY = os.getenv("SECRET_KEY", "fallback-secret")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min == max == default, so hashes made with any other cost report
+# needs_update and are re-hashed on the next successful login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = HTTPBearer()
 
 def verify_password(plain_password, hashed_password):
@@ -24,17 +39,131 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+
+#Password hashing pool
+# bcrypt releases the GIL, so a small dedicated thread pool keeps hashing off
+# the request threadpool. The semaphore bounds running + queued jobs; once it
+# is exhausted callers get an immediate 503 instead of queueing.
+_password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_password_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE)
+_password_stats_lock = threading.Lock()
+_password_stats = {
+    "completed": 0,
+    "rejected": 0,
+    "in_flight": 0,
+    "upgraded": 0,
+    "seconds_total": 0.0,
+    "seconds_max": 0.0,
+}
+
+
+def _timed_password_job(fn, *args):
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        elapsed = time.perf_counter() - start
+        with _password_stats_lock:
+            _password_stats["completed"] += 1
+            _password_stats["seconds_total"] += elapsed
+            _password_stats["seconds_max"] = max(_password_stats["seconds_max"], elapsed)
+
+
+async def run_password_job(fn, *args):
+    """
+    Run a bcrypt operation on the dedicated password pool.
+    Raises 503 when the pool and its queue are full.
+    """
+    if not _password_slots.acquire(blocking=False):
+        with _password_stats_lock:
+            _password_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+    with _password_stats_lock:
+        _password_stats["in_flight"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, _timed_password_job, fn, *args)
+    finally:
+        with _password_stats_lock:
+            _password_stats["in_flight"] -= 1
+        _password_slots.release()
+
+
+async def hash_password(password: str) -> str:
+    return await run_password_job(get_password_hash, password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str):
+    """
+    Returns (valid, new_hash). new_hash is set when the stored hash was made
+    with a different bcrypt cost and should be written back.
+    """
+    valid, new_hash = await run_password_job(
+        pwd_context.verify_and_update, plain_password, hashed_password
+    )
+    if valid and new_hash:
+        with _password_stats_lock:
+            _password_stats["upgraded"] += 1
+    return valid, new_hash
+
+
+def password_hash_stats() -> dict:
+    with _password_stats_lock:
+        stats = dict(_password_stats)
+    stats.update({
+        "workers": PASSWORD_HASH_WORKERS,
+        "queue_size": PASSWORD_HASH_QUEUE_SIZE,
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+        "seconds_avg": stats["seconds_total"] / (stats["completed"] or 1),
+    })
+    return stats
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+#Principal cache
+# Maps a verified token to (role, detached principal, token expiry). Entries
+# never outlive the token itself.
+def _principal_ttu(token, entry, now):
+    return now + min(PRINCIPAL_CACHE_TTL, entry[2] - time.time())
+
+_principal_cache = TLRUCache(maxsize=PRINCIPAL_CACHE_SIZE, ttu=_principal_ttu)
+_principal_lock = threading.Lock()
+
+
+def invalidate_principal(role: str, principal_id: str):
+    """
+    Drop every cached token that resolves to the given principal.
+    Call after writing to the principal's row.
+    """
+    with _principal_lock:
+        stale = [
+            token for token, (cached_role, user, _) in _principal_cache.items()
+            if cached_role == role and user.id == principal_id
+        ]
+        for token in stale:
+            _principal_cache.pop(token, None)
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ):
     token = credentials.credentials
+    with _principal_lock:
+        cached = _principal_cache.get(token)
+    if cached is not None:
+        return cached[1]
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -45,6 +174,7 @@ async def get_current_user(
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         role: str = payload.get("role")
+        expires_at = payload.get("exp")
         if email is None or role is None:
             raise credentials_exception
     except JWTError:
@@ -60,4 +190,11 @@ async def get_current_user(
     if user is None:
         raise credentials_exception
 
+    # Detach so the cached copy keeps its loaded state after this session
+    # commits or closes. Handlers must treat it as read-only.
+    db.expunge(user)
+    if expires_at is not None:
+        with _principal_lock:
+            _principal_cache[token] = (role, user, expires_at)
+
     return user
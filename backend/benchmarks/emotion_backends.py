@@ -0,0 +1,128 @@
+"""
+Compare emotion classifier backends on latency, throughput, memory and
+label agreement with the fp32 PyTorch pipeline.
+
+Run from the backend directory:
+
+    python benchmarks/emotion_backends.py
+    python benchmarks/emotion_backends.py --backends pytorch onnx --input messages.txt
+
+Each backend is measured in a fresh process so RSS numbers are not
+polluted by previously loaded models.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_MESSAGES = [
+    "I feel so alone lately and nobody seems to notice.",
+    "Today was actually a good day, I went for a walk and felt calm.",
+    "I can't stop worrying about my exams, my heart keeps racing.",
+    "Why does everything I do end up going wrong?",
+    "I'm grateful my sister called me, it really helped.",
+    "I'm so angry at my boss, he never listens.",
+    "I haven't slept properly in a week and I'm exhausted.",
+    "Honestly I don't know what I feel anymore.",
+    # Long input to exercise truncation
+    " ".join(["I keep replaying the same conversation over and over in my head."] * 120),
+]
+
+
+def _rss_mb():
+    import psutil
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def _measure(backend, messages, batch_size, rounds, queue):
+    from emotion import build_emotion_classifier, classify_texts
+
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    classifier = build_emotion_classifier(backend)
+    load_seconds = time.perf_counter() - started
+
+    # Warm-up pass, not timed
+    classify_texts(classifier, messages[:1])
+
+    single = []
+    for message in messages:
+        t = time.perf_counter()
+        classify_texts(classifier, [message])
+        single.append(time.perf_counter() - t)
+
+    batched_items = 0
+    t = time.perf_counter()
+    for _ in range(rounds):
+        for i in range(0, len(messages), batch_size):
+            chunk = messages[i:i + batch_size]
+            classify_texts(classifier, chunk)
+            batched_items += len(chunk)
+    batched_seconds = time.perf_counter() - t
+
+    queue.put({
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "latency_ms_p50": statistics.median(single) * 1000,
+        "latency_ms_max": max(single) * 1000,
+        "throughput_per_s": batched_items / batched_seconds,
+        "rss_mb": _rss_mb(),
+        "rss_delta_mb": _rss_mb() - rss_before,
+        "labels": classify_texts(classifier, messages),
+    })
+
+
+def run_backend(backend, messages, batch_size, rounds):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_measure, args=(backend, messages, batch_size, rounds, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["pytorch", "quantized", "onnx"])
+    parser.add_argument("--input", help="text file with one message per line")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    messages = SAMPLE_MESSAGES
+    if args.input:
+        with open(args.input, encoding="utf-8") as f:
+            messages = [line.strip() for line in f if line.strip()]
+
+    backends = args.backends if "pytorch" in args.backends else ["pytorch"] + args.backends
+    results = [run_backend(b, messages, args.batch_size, args.rounds) for b in backends]
+
+    baseline = next(r["labels"] for r in results if r["backend"] == "pytorch")
+    for result in results:
+        matches = sum(a == b for a, b in zip(result.pop("labels"), baseline))
+        result["label_agreement"] = matches / len(baseline)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    header = f"{'backend':<10} {'load s':>7} {'p50 ms':>8} {'max ms':>8} {'items/s':>9} {'RSS MB':>8} {'agree':>6}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['backend']:<10} {r['load_seconds']:>7.1f} {r['latency_ms_p50']:>8.1f} "
+            f"{r['latency_ms_max']:>8.1f} {r['throughput_per_s']:>9.1f} {r['rss_mb']:>8.0f} "
+            f"{r['label_agreement']:>6.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
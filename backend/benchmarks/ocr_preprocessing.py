@@ -0,0 +1,128 @@
+"""
+Measure Tesseract time and text quality on raw versus preprocessed images.
+
+Run from the backend directory against a folder of sample notes:
+
+    python benchmarks/ocr_preprocessing.py samples/
+    python benchmarks/ocr_preprocessing.py samples/ --psm 3 6 --target-dpi 300 200
+
+Each image (.jpg/.jpeg/.png) may have a ground-truth transcript next to it
+with the same name and a .txt extension. Quality is the word-level
+similarity (difflib ratio) to that transcript; images without one are
+scored against the raw OCR output instead, reported as "agreement".
+"""
+import argparse
+import difflib
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+import pytesseract
+
+from extraction import OCR_OEM, OCR_PSM, OCR_TARGET_DPI, preprocess_for_ocr
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def load_corpus(directory):
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in IMAGE_EXTENSIONS:
+            continue
+        truth_path = os.path.join(directory, stem + ".txt")
+        truth = None
+        if os.path.exists(truth_path):
+            with open(truth_path, encoding="utf-8") as f:
+                truth = f.read()
+        corpus.append((name, os.path.join(directory, name), truth))
+    return corpus
+
+
+def similarity(a, b):
+    return difflib.SequenceMatcher(None, a.split(), b.split(), autojunk=False).ratio()
+
+
+def run_variant(path, preprocess, target_dpi, oem, psm, rounds):
+    prep_times, ocr_times, text = [], [], ""
+    for _ in range(rounds):
+        with Image.open(path) as image:
+            image.load()
+            t = time.perf_counter()
+            if preprocess:
+                image = preprocess_for_ocr(image, target_dpi=target_dpi)
+            prep_times.append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            text = pytesseract.image_to_string(image, config=f"--oem {oem} --psm {psm}").strip()
+            ocr_times.append(time.perf_counter() - t)
+    return statistics.median(prep_times), statistics.median(ocr_times), text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of sample images (+ optional .txt transcripts)")
+    parser.add_argument("--target-dpi", type=int, nargs="+", default=[OCR_TARGET_DPI])
+    parser.add_argument("--psm", type=int, nargs="+", default=[OCR_PSM])
+    parser.add_argument("--oem", type=int, default=OCR_OEM)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        sys.exit(f"No images found in {args.corpus}")
+
+    variants = [("raw", False, None, psm) for psm in args.psm]
+    variants += [(f"prep@{dpi}", True, dpi, psm) for dpi in args.target_dpi for psm in args.psm]
+
+    results = []
+    for name, path, truth in corpus:
+        raw_text = None
+        for label, preprocess, dpi, psm in variants:
+            prep_s, ocr_s, text = run_variant(path, preprocess, dpi, args.oem, psm, args.rounds)
+            if raw_text is None:
+                raw_text = text
+            results.append({
+                "image": name,
+                "variant": label,
+                "psm": psm,
+                "preprocess_s": prep_s,
+                "ocr_s": ocr_s,
+                "total_s": prep_s + ocr_s,
+                "quality": similarity(text, truth if truth is not None else raw_text),
+                "scored_against": "truth" if truth is not None else "raw",
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    header = f"{'image':<24} {'variant':<10} {'psm':>3} {'prep s':>7} {'ocr s':>7} {'total s':>8} {'quality':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        quality = f"{r['quality']:.0%}" + ("" if r["scored_against"] == "truth" else "*")
+        print(
+            f"{r['image'][:24]:<24} {r['variant']:<10} {r['psm']:>3} {r['preprocess_s']:>7.2f} "
+            f"{r['ocr_s']:>7.2f} {r['total_s']:>8.2f} {quality:>8}"
+        )
+
+    print()
+    for label, _, _, psm in variants:
+        rows = [r for r in results if r["variant"] == label and r["psm"] == psm]
+        print(
+            f"{label:<10} psm {psm}: mean total {statistics.mean(r['total_s'] for r in rows):.2f}s, "
+            f"mean quality {statistics.mean(r['quality'] for r in rows):.0%}"
+        )
+    if any(r["scored_against"] == "raw" for r in results):
+        print("* no transcript; scored as agreement with raw OCR")
+
+
+if __name__ == "__main__":
+    main()
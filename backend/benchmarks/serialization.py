@@ -0,0 +1,202 @@
+"""
+Compare FastAPI's default response path with FastJSONResponse, and measure
+bytes on the wire with gzip and brotli, for representative route payloads.
+
+Run from the backend directory:
+
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --rows 100 1000 10000 --repeat 20
+
+"default" approximates what FastAPI does for a response_model route:
+validate the content against the model, run jsonable_encoder, then
+json.dumps. "fast" is what the roster routes now do: hand the content
+straight to FastJSONResponse (orjson, pydantic models via .dict()).
+Times are CPU seconds per response (time.process_time).
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
+
+from responses import FastJSONResponse
+from schemas import PatientApplicationOut, PatientApplicationPage, PatientAppointmentOut
+from routes.insurer import _district_adequacy
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RISKS = ["Low", "Moderate", "High", "undiagnosed"]
+STATUSES = ["pending", "approved", "rejected"]
+
+
+def _id():
+    return str(uuid.uuid4())
+
+
+def applications_page(rows):
+    insurer_id = _id()
+    items = [
+        PatientApplicationOut(
+            application_id=_id(),
+            patient_id=_id(),
+            insurer_id=insurer_id,
+            name=f"Patient {i}",
+            age=random.randint(18, 80),
+            gender=random.choice(["Male", "Female"]),
+            riskLevel=random.choice(RISKS),
+            moodScore=random.randint(0, 100),
+            applnStatus=random.choice(STATUSES),
+        )
+        for i in range(rows)
+    ]
+    return {"items": items, "total": rows * 3, "next_cursor": items[-1].application_id}, PatientApplicationPage
+
+
+def appointments_roster(rows):
+    roster = [
+        {
+            "patient_id": _id(),
+            "application_id": _id(),
+            "name": f"Patient {i}",
+            "age": random.randint(18, 80),
+            "gender": random.choice(["Male", "Female"]),
+            "riskLevel": random.choice(RISKS),
+            "moodScore": random.randint(0, 100),
+            "status": random.choice(["active", "inactive"]),
+            "apptStatus": random.choice(["pending", "booked"]),
+        }
+        for i in range(rows)
+    ]
+    return roster, List[PatientAppointmentOut]
+
+
+def district_stats(rows):
+    # rows = districts; the route returns one adequacy dict per district
+    stats = [
+        _district_adequacy(f"District {i}", random.randint(0, 50), random.randint(0, 2000))
+        for i in range(rows)
+    ]
+    return stats, List[Dict]
+
+
+def care_suggestion(rows):
+    # rows = providers in the patient's district
+    providers = [
+        {
+            "id": _id(),
+            "companyName": f"Provider {i}",
+            "contactNo": "0771234567",
+            "email": f"provider{i}@example.com",
+            "address": f"{i} Main Street",
+            "country": "Sri Lanka",
+        }
+        for i in range(rows)
+    ]
+    patient_info = {
+        "id": _id(),
+        "name": "Patient 1",
+        "age": 34,
+        "gender": "Female",
+        "diseaseName": "Generalized anxiety disorder",
+        "riskLevel": "Moderate",
+        "moodScore": 42,
+        "district": "Kandy",
+        "country": "Sri Lanka",
+    }
+    suggestion = "-> Keep a regular sleep schedule and limit caffeine after noon.\n" * 20
+    # The route builds its response directly, so there is no response_model
+    return {"suggestion": suggestion, "providers": providers, "patientInfo": patient_info}, None
+
+
+# Paths as mounted: main.py's include prefix is added to each router's own prefix
+ROUTES = [
+    ("GET /insurer/insurer/patient-applications", applications_page),
+    ("GET /insurer/insurer/patient-appointments", appointments_roster),
+    ("GET /insurer/insurer/dashboard/stats/all", district_stats),
+    ("POST /careschedule/care/patient/overall/{id}", care_suggestion),
+]
+
+
+def default_render(content, response_model):
+    if response_model is None:
+        # Route returns a JSONResponse itself: only the json.dumps step
+        return JSONResponse(content=content).body
+    content = parse_obj_as(response_model, content)
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+
+def fast_render(content, response_model):
+    return FastJSONResponse(content=content).body
+
+
+def cpu_seconds(render, content, response_model, repeat):
+    samples = []
+    for _ in range(repeat):
+        t = time.process_time()
+        render(content, response_model)
+        samples.append(time.process_time() - t)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    random.seed(7)
+    results = []
+    for route, build in ROUTES:
+        for rows in args.rows:
+            content, response_model = build(rows)
+            default_s = cpu_seconds(default_render, content, response_model, args.repeat)
+            fast_s = cpu_seconds(fast_render, content, response_model, args.repeat)
+            body = fast_render(content, response_model)
+            results.append({
+                "route": route,
+                "rows": rows,
+                "default_ms": default_s * 1000,
+                "fast_ms": fast_s * 1000,
+                "speedup": default_s / fast_s if fast_s else float("inf"),
+                "raw_bytes": len(body),
+                "gzip_bytes": len(gzip.compress(body, compresslevel=6)),
+                "br_bytes": len(brotli.compress(body, quality=4)) if brotli else None,
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    header = (
+        f"{'route':<46} {'rows':>6} {'default ms':>10} {'fast ms':>8} {'x':>6} "
+        f"{'raw KB':>8} {'gzip KB':>8} {'br KB':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        br = f"{r['br_bytes'] / 1024:>8.1f}" if r["br_bytes"] is not None else f"{'n/a':>8}"
+        print(
+            f"{r['route']:<46} {r['rows']:>6} {r['default_ms']:>10.2f} {r['fast_ms']:>8.2f} "
+            f"{r['speedup']:>6.1f} {r['raw_bytes'] / 1024:>8.1f} {r['gzip_bytes'] / 1024:>8.1f} {br}"
+        )
+    if brotli is None:
+        print("brotli not installed; br column skipped")
+
+
+if __name__ == "__main__":
+    main()
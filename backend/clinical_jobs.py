@@ -0,0 +1,260 @@
+import asyncio
+import json
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from database import SessionLocal
+from models import ClinicalNoteJob
+from note_analysis import analyze_and_apply
+from note_upload import NoteUpload
+from config import settings
+
+NOTE_JOB_CONCURRENCY = settings.note_job_concurrency
+NOTE_JOB_QUEUE_SIZE = settings.note_job_queue_size
+NOTE_JOB_HEARTBEAT_INTERVAL = settings.note_job_heartbeat_interval
+NOTE_JOB_STALE_AFTER = settings.note_job_stale_after
+
+# Identifies this process as the owner of the jobs (and uploads) it accepted
+WORKER_ID = str(uuid.uuid4())
+ACTIVE = ("queued", "running")
+
+INTERRUPTED = "Interrupted by a server restart, please resubmit"
+
+
+#Job table
+def _stale_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=NOTE_JOB_STALE_AFTER)
+
+
+def _create_job(patient_id: str, filename: str) -> str:
+    db = SessionLocal()
+    try:
+        job = ClinicalNoteJob(
+            patient_id=patient_id,
+            filename=filename,
+            status="queued",
+            worker_id=WORKER_ID,
+            heartbeat_at=datetime.utcnow(),
+        )
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def _update_job(job_id: str, **values) -> bool:
+    """
+    Update a job this worker still owns. Returns False if the job was
+    already failed as stale, so a late result never overwrites that.
+    """
+    db = SessionLocal()
+    try:
+        updated = db.query(ClinicalNoteJob).filter(
+            ClinicalNoteJob.id == job_id,
+            ClinicalNoteJob.worker_id == WORKER_ID,
+            ClinicalNoteJob.status.in_(ACTIVE),
+        ).update({**values, "heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        return bool(updated)
+    finally:
+        db.close()
+
+
+def _heartbeat():
+    db = SessionLocal()
+    try:
+        db.query(ClinicalNoteJob).filter(
+            ClinicalNoteJob.worker_id == WORKER_ID,
+            ClinicalNoteJob.status.in_(ACTIVE),
+        ).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def get_job(job_id: str):
+    db = SessionLocal()
+    try:
+        job = db.query(ClinicalNoteJob).filter(ClinicalNoteJob.id == job_id).first()
+        if not job:
+            return None
+        if job.status in ACTIVE and (job.heartbeat_at or job.created_at) < _stale_cutoff():
+            job.status = "failed"
+            job.error = INTERRUPTED
+            job.finished_at = datetime.utcnow()
+            db.commit()
+        return {
+            "job_id": job.id,
+            "patient_id": job.patient_id,
+            "filename": job.filename,
+            "status": job.status,
+            "result": json.loads(job.result) if job.result else None,
+            "error": job.error,
+            "timings": json.loads(job.timings) if job.timings else {},
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        }
+    finally:
+        db.close()
+
+
+def fail_stale_jobs():
+    """
+    Upload bytes only live in the memory of the worker that accepted them, so
+    jobs whose owner died can never finish. Owners refresh heartbeat_at
+    every NOTE_JOB_HEARTBEAT_INTERVAL; jobs whose heartbeat is older than
+    NOTE_JOB_STALE_AFTER are failed so clients stop polling (get_job applies
+    the same rule to the job being polled). Jobs of live workers are untouched.
+    """
+    db = SessionLocal()
+    try:
+        db.query(ClinicalNoteJob).filter(
+            ClinicalNoteJob.status.in_(ACTIVE),
+            ClinicalNoteJob.heartbeat_at < _stale_cutoff(),
+        ).update(
+            {"status": "failed", "error": INTERRUPTED, "finished_at": datetime.utcnow()},
+            synchronize_session=False,
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+#Queue
+class NoteJobQueue:
+    """
+    Accepts clinical note uploads and analyses them in the background.
+
+    At most `concurrency` jobs run at once (parsing itself happens in the
+    extraction process pool); up to `max_pending` jobs may be queued or
+    running, beyond which submissions get a 503. Job state is persisted in
+    CLINICAL_NOTE_JOBS so any worker can answer status polls.
+    Must only be used from a single event loop.
+    """
+
+    def __init__(self, concurrency: int, max_pending: int):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks = set()
+        self._heartbeat_task = None
+        self.pending = 0
+        self.running = 0
+        self.counts = {"submitted": 0, "succeeded": 0, "failed": 0, "rejected": 0}
+        self._stage_totals = {}
+        self._stage_counts = {}
+
+    async def submit(self, patient_id: str, filename: str, ext: str, upload: NoteUpload) -> str:
+        """Queue an upload; the queue owns it from here and closes it when the job ends."""
+        if self.pending >= self.max_pending:
+            self.counts["rejected"] += 1
+            upload.close()
+            raise HTTPException(
+                status_code=503,
+                detail="Clinical note queue is full, please retry",
+                headers={"Retry-After": "5"},
+            )
+
+        # Reserve the slot before awaiting so concurrent submits see it
+        self.pending += 1
+        try:
+            job_id = await run_in_threadpool(_create_job, patient_id, filename)
+        except Exception:
+            self.pending -= 1
+            upload.close()
+            raise
+
+        self.counts["submitted"] += 1
+        task = asyncio.create_task(self._run(job_id, patient_id, ext, upload, time.perf_counter()))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    async def _run(self, job_id, patient_id, ext, upload, submitted):
+        timings = {}
+        try:
+            async with self._semaphore:
+                timings["queued"] = round(time.perf_counter() - submitted, 4)
+                self.running += 1
+                try:
+                    await run_in_threadpool(_update_job, job_id, status="running", started_at=datetime.utcnow())
+                    result = await analyze_and_apply(patient_id, upload, ext, timings)
+                    status, error = "succeeded", None
+                except HTTPException as he:
+                    result, status, error = None, "failed", str(he.detail)
+                except Exception as e:
+                    print(f"Clinical note job {job_id} failed: {e}")
+                    print(traceback.format_exc())
+                    result, status, error = None, "failed", "Internal Server Error"
+                finally:
+                    self.running -= 1
+
+                timings["total"] = round(time.perf_counter() - submitted, 4)
+                self._record(status, timings)
+                recorded = await run_in_threadpool(
+                    _update_job,
+                    job_id,
+                    status=status,
+                    result=json.dumps(result) if result else None,
+                    error=error,
+                    timings=json.dumps(timings),
+                    finished_at=datetime.utcnow(),
+                )
+                if not recorded:
+                    print(f"Clinical note job {job_id} was already failed as stale; result dropped")
+        except Exception as e:
+            # The job row could not be updated; fail_stale_jobs cleans it up later
+            print(f"Clinical note job {job_id} could not be recorded: {e}")
+        finally:
+            self.pending -= 1
+            upload.close()
+
+    def _record(self, status: str, timings: dict):
+        self.counts[status] += 1
+        for name, seconds in timings.items():
+            if not isinstance(seconds, float):
+                continue  # e.g. the per-page PDF report
+            self._stage_totals[name] = self._stage_totals.get(name, 0.0) + seconds
+            self._stage_counts[name] = self._stage_counts.get(name, 0) + 1
+
+    def start(self):
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(NOTE_JOB_HEARTBEAT_INTERVAL)
+            if not self.pending:
+                continue
+            try:
+                await run_in_threadpool(_heartbeat)
+            except Exception as e:
+                print(f"Clinical note job heartbeat failed: {e}")
+
+    async def shutdown(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_pending": self.max_pending,
+            "queue_depth": self.pending - self.running,
+            "running": self.running,
+            **self.counts,
+            "stage_seconds_avg": {
+                name: round(total / self._stage_counts[name], 4)
+                for name, total in self._stage_totals.items()
+            },
+        }
+
+
+note_job_queue = NoteJobQueue(NOTE_JOB_CONCURRENCY, NOTE_JOB_QUEUE_SIZE)
@@ -0,0 +1,129 @@
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+from config import settings
+
+# Brotli is optional; without it clients are served gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MINIMUM_SIZE = settings.compression_minimum_size
+GZIP_LEVEL = settings.gzip_level
+BROTLI_QUALITY = settings.brotli_quality
+
+# Never buffered: each event must reach the client as soon as it is sent
+UNCOMPRESSED_MEDIA_TYPES = ("text/event-stream",)
+
+
+def negotiate_encoding(accept_encoding: str):
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0."""
+    offered = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            offered[name.lower()] = q
+
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    wildcard = offered.get("*", 0.0)
+    scored = [(offered.get(name, wildcard), -i, name) for i, name in enumerate(candidates)]
+    q, _, name = max(scored)
+    return name if q > 0 else None
+
+
+class _GzipStream:
+    def __init__(self):
+        self._z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._z.compress(data)
+        return out + self._z.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._c.process(data)
+        return out + (self._c.finish() if final else self._c.flush())
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with brotli or gzip, whichever the
+    client prefers (brotli only when the package is installed).
+
+    Single-chunk bodies smaller than minimum_size are sent as-is. Streaming
+    bodies (ndjson/csv rosters) are compressed chunk by chunk with a flush
+    after each, so clients still receive rows incrementally. Server-sent
+    events and responses that already carry a Content-Encoding pass through.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        stream = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, stream, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                media_type = headers.get("content-type", "")
+                passthrough = "content-encoding" in headers or media_type.startswith(UNCOMPRESSED_MEDIA_TYPES)
+                if passthrough:
+                    await send(message)
+                else:
+                    # Held back until the first body chunk shows whether to compress
+                    start = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if stream is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                stream = _BrotliStream() if encoding == "br" else _GzipStream()
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["content-length"]
+                await send(start)
+
+            await send({
+                "type": "http.response.body",
+                "body": stream.compress(body, final=not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,128 @@
+# config.py
+import os
+from typing import Optional
+from dotenv import load_dotenv
+from pydantic import BaseSettings
+
+# The only place .env is read; every module takes its settings from here
+load_dotenv()
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Settings(BaseSettings):
+    """
+    Application settings, read once from the environment (and .env).
+    Field names map case-insensitively to environment variables,
+    e.g. db_pool_size <- DB_POOL_SIZE.
+    """
+
+    #Snowflake
+    snowflake_user: Optional[str] = None
+    snowflake_password: Optional[str] = None
+    snowflake_account: Optional[str] = None
+    snowflake_database: Optional[str] = None
+    snowflake_schema: Optional[str] = None
+    snowflake_warehouse: Optional[str] = None
+    snowflake_role: Optional[str] = None
+
+    #Connection pool
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 3600
+    db_pool_idle_timeout: int = 600
+    db_pool_pre_ping: bool = True
+
+    #Auth
+    secret_key: str = "fallback-secret"
+    algorithm: str = "HS256"
+    access_token_expire_minutes: int = 30
+    principal_cache_size: int = 4096
+    principal_cache_ttl: int = 60
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
+    password_hash_queue_size: int = 32
+
+    #Caches and indexes
+    district_stats_cache_ttl: int = 30
+    district_stats_reconcile_interval: float = 3600
+    provider_index_ttl: int = 300
+    care_suggestion_cache_size: int = 1024
+    care_suggestion_cache_ttl: int = 3600
+    note_cache_dir: str = os.path.join(BACKEND_DIR, ".note_cache")
+    note_cache_memory_size: int = 256
+    note_cache_max_bytes: int = 256 * 1024 * 1024
+    note_cache_max_entries: int = 10000
+
+    #Email
+    email_user: Optional[str] = None
+    email_password: Optional[str] = None
+    smtp_server: str = "smtp.gmail.com"
+    smtp_port: int = 587
+    smtp_starttls: bool = True
+    smtp_idle_timeout: int = 60
+    outbox_batch_size: int = 50
+    outbox_poll_interval: float = 2
+    outbox_max_attempts: int = 6
+    outbox_backoff_base: int = 30
+    outbox_backoff_max: int = 3600
+    outbox_claim_timeout: int = 300
+
+    #Risk model
+    risk_model_dir: str = os.path.join(BACKEND_DIR, "routes")
+    risk_model_version: Optional[str] = None
+    risk_model_reload_interval: float = 30
+
+    #Emotion classifier
+    emotion_model: str = "joeddav/distilbert-base-uncased-go-emotions-student"
+    emotion_backend: str = "pytorch"
+    emotion_max_length: int = 128
+    emotion_batch_max_size: int = 16
+    emotion_batch_window_ms: float = 10
+
+    #Gemini
+    gemini_api_key: Optional[str] = None
+    gemini_model: str = "gemini-2.5-flash"
+
+    #Ollama
+    ollama_base_url: str = "http://localhost:11434"
+    ollama_model: str = "mistral"
+    ollama_max_concurrency: int = 2
+    ollama_timeout: float = 120
+    ollama_keep_alive: str = "10m"
+
+    #Clinical notes
+    note_upload_max_bytes: int = 20 * 1024 * 1024
+    note_upload_spool_bytes: int = 2 * 1024 * 1024
+    note_upload_tmp_dir: Optional[str] = None
+    note_extraction_workers: int = 2
+    note_extract_target_chars: int = 40000
+    pdf_pages_per_task: int = 4
+    pdf_ocr_resolution: int = 200
+    ocr_preprocess: bool = True
+    ocr_target_dpi: int = 300
+    ocr_page_inches: float = 11
+    ocr_binarize: bool = True
+    ocr_deskew: bool = True
+    ocr_max_skew_degrees: float = 10
+    ocr_oem: int = 3
+    ocr_psm: int = 3
+    note_chunk_tokens: int = 1500
+    note_chunk_overlap_tokens: int = 150
+    note_max_chunks: int = 8
+    note_job_concurrency: int = 4
+    note_job_queue_size: int = 64
+    note_job_heartbeat_interval: float = 30
+    note_job_stale_after: int = 120
+
+    #Responses
+    compression_minimum_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 4
+
+    #Startup
+    warmup_models: bool = True
+
+
+settings = Settings()
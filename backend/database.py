@@ -1,18 +1,27 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
-from dotenv import load_dotenv
+from sqlalchemy.pool import QueuePool
+from contextlib import contextmanager
+import threading
+import time
+from config import settings
 
-load_dotenv()
+SNOWFLAKE_USER = settings.snowflake_user
+SNOWFLAKE_PASSWORD = settings.snowflake_password
+SNOWFLAKE_ACCOUNT = settings.snowflake_account
+SNOWFLAKE_DATABASE = settings.snowflake_database
+SNOWFLAKE_SCHEMA = settings.snowflake_schema
+SNOWFLAKE_WAREHOUSE = settings.snowflake_warehouse
+SNOWFLAKE_ROLE = settings.snowflake_role
 
-SNOWFLAKE_USER = os.getenv("SNOWFLAKE_USER")
-SNOWFLAKE_PASSWORD = os.getenv("SNOWFLAKE_PASSWORD")
-SNOWFLAKE_ACCOUNT = os.getenv("SNOWFLAKE_ACCOUNT")
-SNOWFLAKE_DATABASE = os.getenv("SNOWFLAKE_DATABASE")
-SNOWFLAKE_SCHEMA = os.getenv("SNOWFLAKE_SCHEMA")
-SNOWFLAKE_WAREHOUSE = os.getenv("SNOWFLAKE_WAREHOUSE")
-SNOWFLAKE_ROLE = os.getenv("SNOWFLAKE_ROLE")
+# Pool settings
+DB_POOL_SIZE = settings.db_pool_size
+DB_MAX_OVERFLOW = settings.db_max_overflow
+DB_POOL_TIMEOUT = settings.db_pool_timeout
+DB_POOL_RECYCLE = settings.db_pool_recycle
+DB_POOL_IDLE_TIMEOUT = settings.db_pool_idle_timeout
+DB_POOL_PRE_PING = settings.db_pool_pre_ping
 
 # Connection URL
 SQLALCHEMY_DATABASE_URL = (
@@ -21,7 +30,75 @@ SQLALCHEMY_DATABASE_URL = (
     f"?warehouse={SNOWFLAKE_WAREHOUSE}&role={SNOWFLAKE_ROLE}"
 )
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+
+#Pool statistics
+_stats_lock = threading.Lock()
+_pool_stats = {
+    "checkouts": 0,
+    "connects": 0,
+    "idle_discards": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+    "timeouts": 0,
+}
+
+
+def _record(key: str, value=1):
+    with _stats_lock:
+        _pool_stats[key] += value
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long callers wait to check out a connection.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            _record("timeouts")
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with _stats_lock:
+                _pool_stats["wait_seconds_total"] += waited
+                _pool_stats["wait_seconds_max"] = max(_pool_stats["wait_seconds_max"], waited)
+
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    _record("connects")
+
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    connection_record.info["last_checkin"] = time.monotonic()
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    # Connections idle for longer than the warehouse session keep-alive are
+    # discarded; the pool then transparently retries with a fresh connection.
+    last_checkin = connection_record.info.get("last_checkin")
+    if last_checkin is not None and time.monotonic() - last_checkin > DB_POOL_IDLE_TIMEOUT:
+        _record("idle_discards")
+        connection_record.info.pop("last_checkin", None)
+        raise exc.DisconnectionError("Connection idle for longer than DB_POOL_IDLE_TIMEOUT")
+    _record("checkouts")
+
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -33,3 +110,32 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+@contextmanager
+def get_raw_connection():
+    """
+    Borrow a pooled DBAPI (snowflake.connector) connection for raw SQL.
+    Closing it returns it to the shared pool instead of logging out.
+    """
+    conn = engine.raw_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def pool_stats() -> dict:
+    pool = engine.pool
+    with _stats_lock:
+        stats = dict(_pool_stats)
+    checkouts = stats["checkouts"] or 1
+    stats.update({
+        "pool_size": pool.size(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "wait_seconds_avg": stats["wait_seconds_total"] / checkouts,
+    })
+    return stats
@@ -0,0 +1,157 @@
+# district_stats.py
+import threading
+from cachetools import TTLCache
+from sqlalchemy import event, func, insert, literal, select, text, union_all
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models import DistrictStats, Insurer, Patient
+
+DISTRICT_STATS_CACHE_TTL = settings.district_stats_cache_ttl
+DISTRICT_STATS_RECONCILE_INTERVAL = settings.district_stats_reconcile_interval
+
+_ALL_DISTRICTS = object()
+
+_cache = TTLCache(maxsize=4096, ttl=DISTRICT_STATS_CACHE_TTL)
+_cache_lock = threading.Lock()
+
+# MERGE keeps exactly one row per district; Snowflake serialises concurrent
+# MERGEs on the same table so two first-time signups cannot both insert.
+_MERGE_DELTA = text("""
+    MERGE INTO DISTRICT_STATS t
+    USING (SELECT :district AS district) s
+    ON t.district = s.district
+    WHEN MATCHED THEN UPDATE SET
+        provider_count = t.provider_count + :providers,
+        patient_count = t.patient_count + :patients
+    WHEN NOT MATCHED THEN INSERT (district, provider_count, patient_count)
+        VALUES (s.district, GREATEST(:providers, 0), GREATEST(:patients, 0))
+""")
+
+
+def record_district_change(db: Session, district: str, providers: int = 0, patients: int = 0):
+    """
+    Apply a provider/patient delta to the district aggregate inside the
+    caller's transaction. The cache is invalidated once that transaction commits.
+    """
+    if not district or (providers == 0 and patients == 0):
+        return
+    db.execute(_MERGE_DELTA, {"district": district, "providers": providers, "patients": patients})
+    db.info.setdefault("stale_districts", set()).add(district)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_committed(session):
+    stale = session.info.pop("stale_districts", None)
+    if stale:
+        invalidate_district_stats(*stale)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("stale_districts", None)
+
+
+def invalidate_district_stats(*districts):
+    with _cache_lock:
+        for district in districts:
+            _cache.pop(district, None)
+        _cache.pop(_ALL_DISTRICTS, None)
+
+
+def _live_district_counts():
+    """One GROUP BY over insurers and patients, keyed by district."""
+    members = union_all(
+        select(
+            Insurer.district.label("district"),
+            literal(1).label("providers"),
+            literal(0).label("patients"),
+        ),
+        select(Patient.district, literal(0), literal(1)),
+    ).subquery()
+    return (
+        select(
+            members.c.district,
+            func.sum(members.c.providers),
+            func.sum(members.c.patients),
+        )
+        .group_by(members.c.district)
+    )
+
+
+def get_district_counts(db: Session, district: str):
+    """Returns (total_providers, patients_in_district) for one district."""
+    with _cache_lock:
+        cached = _cache.get(district)
+    if cached is not None:
+        return cached
+
+    row = (
+        db.query(DistrictStats.provider_count, DistrictStats.patient_count)
+        .filter(DistrictStats.district == district)
+        .first()
+    )
+    if row is None:
+        # District not in the aggregate yet, e.g. before the first rebuild
+        row = (
+            db.query(Insurer).filter(Insurer.district == district).count(),
+            db.query(Patient).filter(Patient.district == district).count(),
+        )
+    counts = (int(row[0] or 0), int(row[1] or 0))
+
+    with _cache_lock:
+        _cache[district] = counts
+    return counts
+
+
+def get_all_district_counts(db: Session):
+    """Returns [(district, total_providers, patients_in_district), ...]."""
+    with _cache_lock:
+        cached = _cache.get(_ALL_DISTRICTS)
+    if cached is not None:
+        return cached
+
+    counts = [
+        (district, int(providers or 0), int(patients or 0))
+        for district, providers, patients in db.execute(_live_district_counts())
+    ]
+
+    with _cache_lock:
+        _cache[_ALL_DISTRICTS] = counts
+    return counts
+
+
+def rebuild_district_stats(db: Session):
+    """
+    Recompute the aggregate from the base tables in one transaction.
+
+    The DELETE runs first so it takes Snowflake's table lock before the
+    counts are read: concurrent rebuilds (e.g. several workers starting at
+    once) and MERGE deltas queue behind it instead of interleaving, so the
+    table never ends up with duplicate district rows.
+    """
+    db.query(DistrictStats).delete(synchronize_session=False)
+    live = _live_district_counts().subquery()
+    db.execute(
+        insert(DistrictStats).from_select(
+            ["district", "provider_count", "patient_count"],
+            select(live.c[0], live.c[1], live.c[2]).where(live.c[0].isnot(None)),
+        )
+    )
+    db.commit()
+    with _cache_lock:
+        _cache.clear()
+
+
+def reconcile_district_stats():
+    """
+    Rebuild the aggregate from the base tables. Runs at startup (seeding an
+    empty table) and every DISTRICT_STATS_RECONCILE_INTERVAL seconds, so any
+    drift in the incremental deltas is corrected.
+    """
+    db = SessionLocal()
+    try:
+        rebuild_district_stats(db)
+    finally:
+        db.close()
@@ -0,0 +1,181 @@
+# emotion.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import settings
+
+EMOTION_MODEL = settings.emotion_model
+EMOTION_BATCH_MAX_SIZE = settings.emotion_batch_max_size
+EMOTION_BATCH_WINDOW_MS = settings.emotion_batch_window_ms
+# pytorch | quantized | onnx
+EMOTION_BACKEND = settings.emotion_backend.lower()
+EMOTION_MAX_LENGTH = settings.emotion_max_length
+
+
+def build_emotion_classifier(backend: str = EMOTION_BACKEND, model_name: str = EMOTION_MODEL):
+    """
+    Build the emotion text-classification pipeline on the requested backend.
+
+    pytorch    the original fp32 model
+    quantized  dynamic int8 quantisation of every nn.Linear (CPU only)
+    onnx       exported ONNX Runtime session via optimum
+    """
+    # transformers is imported here so importing this module stays cheap
+    from transformers import pipeline
+
+    if backend == "pytorch":
+        return pipeline("text-classification", model=model_name)
+
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    if backend == "quantized":
+        import torch
+        from transformers import AutoModelForSequenceClassification
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return pipeline("text-classification", model=model, tokenizer=tokenizer)
+
+    if backend == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+        except ImportError:
+            raise RuntimeError("EMOTION_BACKEND=onnx requires optimum[onnxruntime]")
+        model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+        return pipeline("text-classification", model=model, tokenizer=tokenizer)
+
+    raise ValueError(f"Unknown EMOTION_BACKEND '{backend}'")
+
+
+def classify_texts(classifier, texts):
+    """Top label per text; inputs are truncated to EMOTION_MAX_LENGTH tokens."""
+    results = classifier(
+        texts, batch_size=len(texts), truncation=True, max_length=EMOTION_MAX_LENGTH
+    )
+    return [result["label"] for result in results]
+
+
+# HuggingFace emotion classifier, built on first use or by the startup warmup
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_emotion_classifier():
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = build_emotion_classifier()
+    return _classifier
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for up to window_ms (or max_batch_size items)
+    and runs fn once per batch on a dedicated worker thread.
+
+    fn takes a list of inputs and returns a list of results in the same order.
+    """
+
+    def __init__(self, fn, max_batch_size: int = EMOTION_BATCH_MAX_SIZE,
+                 window_ms: float = EMOTION_BATCH_WINDOW_MS, name: str = "batcher"):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "batch_size_max": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0,
+            "inference_seconds_total": 0.0,
+        }
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item):
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.window
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            batch = [entry for entry in batch if not entry[1].cancelled()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                results = await self._loop.run_in_executor(
+                    self._executor, self.fn, [item for item, _, _ in batch]
+                )
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+            waits = [started - enqueued for _, _, enqueued in batch]
+            with self._stats_lock:
+                self._stats["requests"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["batch_size_max"] = max(self._stats["batch_size_max"], len(batch))
+                self._stats["queue_wait_seconds_total"] += sum(waits)
+                self._stats["queue_wait_seconds_max"] = max(self._stats["queue_wait_seconds_max"], *waits)
+                self._stats["inference_seconds_total"] += finished - started
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            "max_batch_size": self.max_batch_size,
+            "window_ms": self.window * 1000,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "batch_size_avg": stats["requests"] / (stats["batches"] or 1),
+            "queue_wait_seconds_avg": stats["queue_wait_seconds_total"] / (stats["requests"] or 1),
+        })
+        return stats
+
+
+def _classify_batch(texts):
+    return classify_texts(get_emotion_classifier(), texts)
+
+
+emotion_batcher = MicroBatcher(_classify_batch, name="emotion")
+
+
+async def classify_emotion(text: str) -> str:
+    """Top emotion label for text, batched with concurrent callers."""
+    return await emotion_batcher.submit(text)
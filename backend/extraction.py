@@ -0,0 +1,250 @@
+import asyncio
+import io
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pdfplumber
+import pytesseract
+import docx
+from PIL import Image, ImageOps
+from config import settings
+
+NOTE_EXTRACTION_WORKERS = settings.note_extraction_workers
+NOTE_EXTRACT_TARGET_CHARS = settings.note_extract_target_chars
+PDF_PAGES_PER_TASK = settings.pdf_pages_per_task
+PDF_OCR_RESOLUTION = settings.pdf_ocr_resolution
+OCR_PREPROCESS = settings.ocr_preprocess
+OCR_TARGET_DPI = settings.ocr_target_dpi
+OCR_PAGE_INCHES = settings.ocr_page_inches
+OCR_BINARIZE = settings.ocr_binarize
+OCR_DESKEW = settings.ocr_deskew
+OCR_MAX_SKEW_DEGREES = settings.ocr_max_skew_degrees
+OCR_OEM = settings.ocr_oem
+OCR_PSM = settings.ocr_psm
+
+# Skew is estimated on a copy this wide; plenty for line-level structure
+DESKEW_SAMPLE_WIDTH = 800
+
+SUPPORTED_EXTENSIONS = [".pdf", ".docx", ".jpg", ".jpeg", ".png"]
+
+
+#Parsers
+# These run inside the extraction process pool, so they must stay top-level
+# functions taking and returning plain picklable values.
+def _as_file(source):
+    """source is the upload's bytes or the path of its spooled temp file."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+#OCR
+def otsu_threshold(pixels: np.ndarray) -> int:
+    """Grey level that best separates ink from paper (Otsu's method)."""
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    weights = np.cumsum(histogram)
+    means = np.cumsum(histogram * np.arange(256))
+    total, total_mean = weights[-1], means[-1]
+    background = weights[:-1]
+    foreground = total - background
+    valid = (background > 0) & (foreground > 0)
+    between = np.zeros(255)
+    between[valid] = (
+        (total_mean * background[valid] - means[:-1][valid] * total) ** 2
+        / (background[valid] * foreground[valid])
+    )
+    return int(np.argmax(between))
+
+def estimate_skew(image: Image.Image, threshold: int, max_degrees: float = OCR_MAX_SKEW_DEGREES) -> float:
+    """
+    Projection-profile skew estimate: text lines are level when the row
+    sums of ink are most uneven. Coarse 1 degree search, then 0.1 degree.
+    """
+    scale = min(1.0, DESKEW_SAMPLE_WIDTH / image.width)
+    sample = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))))
+    ink = sample.point(lambda p: 255 if p <= threshold else 0)
+
+    def score(angle):
+        rotated = np.asarray(ink.rotate(angle, expand=True, fillcolor=0), dtype=np.float64)
+        return np.var(rotated.sum(axis=1))
+
+    best = max(np.arange(-max_degrees, max_degrees + 1, 1.0), key=score)
+    best = max(np.arange(best - 1, best + 1.01, 0.1), key=score)
+    return float(round(best, 2))
+
+def preprocess_for_ocr(
+    image: Image.Image,
+    target_dpi: int = OCR_TARGET_DPI,
+    binarize: bool = OCR_BINARIZE,
+    deskew: bool = OCR_DESKEW,
+) -> Image.Image:
+    """
+    Orient, greyscale and downscale the image so its long side is at most
+    target_dpi * OCR_PAGE_INCHES pixels (phone photos are far above what
+    Tesseract needs), then optionally deskew and binarise it.
+    """
+    image = ImageOps.exif_transpose(image).convert("L")
+
+    max_side = int(target_dpi * OCR_PAGE_INCHES)
+    if max(image.size) > max_side:
+        scale = max_side / max(image.size)
+        image = image.resize(
+            (int(image.width * scale), int(image.height * scale)),
+            Image.Resampling.LANCZOS,
+            reducing_gap=2.0,
+        )
+
+    if not (binarize or deskew):
+        return image
+
+    threshold = otsu_threshold(np.asarray(image))
+    if deskew:
+        angle = estimate_skew(image, threshold)
+        if abs(angle) >= 0.1:
+            image = image.rotate(angle, resample=Image.Resampling.BILINEAR, expand=True, fillcolor=255)
+    if binarize:
+        image = image.point(lambda p: 255 if p > threshold else 0)
+    return image
+
+def ocr_image(image: Image.Image, preprocess: bool = OCR_PREPROCESS, oem: int = OCR_OEM, psm: int = OCR_PSM) -> str:
+    if preprocess:
+        image = preprocess_for_ocr(image)
+    return pytesseract.image_to_string(image, config=f"--oem {oem} --psm {psm}").strip()
+
+def _pdf_page_text(page):
+    """Text layer of one page, falling back to OCR for scanned pages."""
+    text = (page.extract_text() or "").strip()
+    if text:
+        return text, False
+    image = page.to_image(resolution=PDF_OCR_RESOLUTION).original
+    return ocr_image(image), True
+
+def pdf_page_count(source) -> int:
+    with pdfplumber.open(_as_file(source)) as pdf:
+        return len(pdf.pages)
+
+def extract_pdf_pages(source, start: int, end: int) -> list:
+    """Extract pages [start, end) and report per-page timings."""
+    pages = []
+    with pdfplumber.open(_as_file(source)) as pdf:
+        for number in range(start, min(end, len(pdf.pages))):
+            began = time.perf_counter()
+            text, ocr = _pdf_page_text(pdf.pages[number])
+            pages.append({
+                "page": number + 1,
+                "text": text,
+                "chars": len(text),
+                "ocr": ocr,
+                "seconds": round(time.perf_counter() - began, 4),
+            })
+    return pages
+
+def extract_text_from_word(source):
+    doc = docx.Document(source)
+    return "\n".join([p.text for p in doc.paragraphs]).strip()
+
+def extract_text_from_image(source):
+    with Image.open(source) as image:
+        return ocr_image(image)
+
+def extract_text(ext: str, source) -> str:
+    """Word and image notes. PDFs go through extract_pdf_text, page-parallel."""
+    if ext == ".pdf":
+        raise ValueError("PDFs must be extracted with extract_pdf_text")
+    source = _as_file(source)
+    if ext == ".docx":
+        return extract_text_from_word(source)
+    return extract_text_from_image(source)
+
+
+#Process pool
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _pool_context():
+    # Never fork the serving process: it runs the outbox, bcrypt and emotion
+    # threads, so a forked worker could inherit a held lock, and it would
+    # inherit the loaded models as well. Workers come from a forkserver that
+    # has only imported this module (spawn where forkserver is unavailable).
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=NOTE_EXTRACTION_WORKERS, mp_context=_pool_context())
+        return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False)
+
+
+async def run_in_extraction_pool(fn, *args):
+    """
+    Run a CPU-bound parser in the shared process pool so OCR and PDF parsing
+    never hold the event loop or the GIL of the serving process.
+    A worker crash (e.g. OOM on a huge scan) replaces the pool once.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    try:
+        return await loop.run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        print("Extraction pool broke, restarting it")
+        _reset_pool(pool)
+        return await loop.run_in_executor(_get_pool(), fn, *args)
+
+
+async def extract_pdf_text(source, report: dict) -> str:
+    """
+    Extract a PDF in page ranges of PDF_PAGES_PER_TASK spread over the
+    extraction pool. Ranges are dispatched in waves of one per worker and
+    extraction stops after the wave that reaches NOTE_EXTRACT_TARGET_CHARS,
+    so long referral bundles only pay for the pages the analysis will use.
+    Per-page timings are written to report["pages"].
+    """
+    page_count = await run_in_extraction_pool(pdf_page_count, source)
+    ranges = [(start, start + PDF_PAGES_PER_TASK) for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+
+    pages = []
+    chars = 0
+    for i in range(0, len(ranges), NOTE_EXTRACTION_WORKERS):
+        wave = ranges[i:i + NOTE_EXTRACTION_WORKERS]
+        results = await asyncio.gather(*[
+            run_in_extraction_pool(extract_pdf_pages, source, start, end) for start, end in wave
+        ])
+        for result in results:
+            pages.extend(result)
+            chars += sum(page["chars"] for page in result)
+        if chars >= NOTE_EXTRACT_TARGET_CHARS:
+            break
+
+    report["page_count"] = page_count
+    report["pages_extracted"] = len(pages)
+    report["pages"] = [{k: v for k, v in page.items() if k != "text"} for page in pages]
+    return "\n".join(page["text"] for page in pages if page["text"]).strip()
+
+
+def shutdown_extraction_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def extraction_pool_stats() -> dict:
+    return {"workers": NOTE_EXTRACTION_WORKERS, "started": _pool is not None}
@@ -0,0 +1,107 @@
+# llm.py
+import asyncio
+import hashlib
+import json
+import google.generativeai as genai
+from cachetools import TTLCache
+
+from config import settings
+
+GEMINI_MODEL = settings.gemini_model
+
+# Gemini AI, one shared model instance for every router
+genai.configure(api_key=settings.gemini_api_key)
+gemini_model = genai.GenerativeModel(GEMINI_MODEL)
+
+
+async def generate_text(prompt: str) -> str:
+    """Full completion without blocking the event loop."""
+    response = await gemini_model.generate_content_async(prompt)
+    return response.text
+
+
+async def stream_text(prompt: str):
+    """Yield completion text chunks as Gemini produces them."""
+    response = await gemini_model.generate_content_async(prompt, stream=True)
+    async for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunk carried no text part (e.g. only safety metadata)
+            continue
+        if text:
+            yield text
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+class SingleFlightCache:
+    """
+    Bounded TTL cache for async results. Concurrent misses on the same key
+    share one in-flight call instead of each starting their own.
+    Must only be used from a single event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Stable hash of the normalised inputs (trimmed, case-folded)."""
+        normalised = [str(p).strip().casefold() if p is not None else None for p in parts]
+        return hashlib.sha256(json.dumps(normalised).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        value = self._cache.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._cache[key] = value
+
+    async def get_or_create(self, key, factory):
+        value = self._cache.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._settle(key, t))
+
+        # shield: one caller disconnecting must not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _settle(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self._cache[key] = task.result()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": (self.hits + self.coalesced) / (lookups or 1),
+            "size": len(self._cache),
+            "in_flight": len(self._inflight),
+        }
@@ -1,10 +1,109 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from config import settings
+from responses import FastJSONResponse
+from compression import CompressionMiddleware
+from database import Base, engine, pool_stats
+from district_stats import reconcile_district_stats, DISTRICT_STATS_RECONCILE_INTERVAL
+from provider_index import warm_provider_index
+from auth import password_hash_stats
+from outbox import outbox_worker
+from emotion import emotion_batcher, get_emotion_classifier
+from model_registry import risk_model_registry
+from ollama_client import ollama_client
+from note_cache import note_cache
+from extraction import shutdown_extraction_pool, extraction_pool_stats
+from clinical_jobs import note_job_queue, fail_stale_jobs
+from routes.careschedule import care_suggestion_cache
 
 # Routers
 from routes import patient, insurer, careschedule, clinicalnotes, chatbot, riskprediction
 
-app = FastAPI(title="Yggdrasil Backend", version="1.0.0")
+
+#Warmup
+# Each component is "pending", "ready" or "failed: <reason>". Only the
+# database gates readiness; models load lazily if a request beats the warmup.
+readiness = {"database": "pending", "provider_index": "pending"}
+if settings.warmup_models:
+    readiness.update({
+        "risk_model": "pending",
+        "emotion_classifier": "pending",
+        "ollama_model": "pending",
+    })
+
+DATABASE_RETRY_SECONDS = 5
+
+
+def prepare_database():
+    # checkfirst: only tables missing from the schema are created
+    Base.metadata.create_all(bind=engine)
+    reconcile_district_stats()
+    fail_stale_jobs()
+
+
+async def _warm(name: str, step, retry: bool = False):
+    while True:
+        try:
+            await run_in_threadpool(step)
+            readiness[name] = "ready"
+            return
+        except Exception as e:
+            readiness[name] = f"failed: {e}"
+            print(f"Warmup of {name} failed: {e}")
+            if not retry:
+                return
+        await asyncio.sleep(DATABASE_RETRY_SECONDS)
+
+
+async def warm_up():
+    async def data():
+        await _warm("database", prepare_database, retry=True)
+        await _warm("provider_index", warm_provider_index)
+
+    steps = [data()]
+    if settings.warmup_models:
+        steps.append(_warm("risk_model", risk_model_registry.get))
+        steps.append(_warm("emotion_classifier", get_emotion_classifier))
+        steps.append(_warm("ollama_model", ollama_client.warm_up))
+    await asyncio.gather(*steps)
+
+
+async def reconcile_periodically():
+    # Corrects any drift in the incremental DISTRICT_STATS deltas
+    while True:
+        await asyncio.sleep(DISTRICT_STATS_RECONCILE_INTERVAL)
+        try:
+            await run_in_threadpool(reconcile_district_stats)
+        except Exception as e:
+            print(f"District stats reconciliation failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy resources load in the background so the worker serves
+    # lightweight routes and health probes straight away
+    warmup = asyncio.create_task(warm_up())
+    reconcile = asyncio.create_task(reconcile_periodically())
+    outbox_worker.start()
+    note_job_queue.start()
+    yield
+    warmup.cancel()
+    reconcile.cancel()
+    await note_job_queue.shutdown()
+    shutdown_extraction_pool()
+    await ollama_client.aclose()
+    await run_in_threadpool(outbox_worker.stop)
+
+
+app = FastAPI(
+    title="Yggdrasil Backend",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
 #Middleware
 origins = [
@@ -20,6 +119,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# br/gzip negotiated per request; small bodies and SSE are sent uncompressed
+app.add_middleware(CompressionMiddleware)
+
 #Prefixes
 app.include_router(patient.router, prefix="/patient", tags=["Patient"])
 app.include_router(insurer.router, prefix="/insurer", tags=["Insurer"])
@@ -32,3 +134,33 @@ app.include_router(riskprediction.router, prefix="/riskprediction", tags=["RiskP
 @app.get("/")
 def root():
     return {"message": "Yggdrasil Backend is running 🚀"}
+
+
+#health
+@app.get("/health/live")
+def health_live():
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+def health_ready():
+    ready = readiness["database"] == "ready"
+    return FastJSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "components": readiness},
+    )
+
+
+#metrics
+@app.get("/metrics")
+def metrics():
+    return {
+        "db_pool": pool_stats(),
+        "password_hashing": password_hash_stats(),
+        "email_outbox": dict(outbox_worker.stats),
+        "emotion_batching": emotion_batcher.stats(),
+        "care_suggestion_cache": care_suggestion_cache.stats(),
+        "clinical_note_cache": note_cache.stats(),
+        "clinical_note_jobs": note_job_queue.stats(),
+        "note_extraction_pool": extraction_pool_stats(),
+    }
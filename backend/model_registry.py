@@ -0,0 +1,169 @@
+# model_registry.py
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+import joblib
+import numpy as np
+
+from config import settings
+
+RISK_MODEL_DIR = settings.risk_model_dir
+RISK_MODEL_VERSION = settings.risk_model_version
+RISK_MODEL_RELOAD_INTERVAL = settings.risk_model_reload_interval
+
+MODEL_FILE = "risk_model_hgb.pkl"
+ENCODERS_FILE = "encoders.pkl"
+CURRENT_FILE = "CURRENT"
+DEFAULT_VERSION = "default"
+
+# Categorical features compiled into lookup tables at load time
+CATEGORICAL_FEATURES = ["Gender", "Emotional_State"]
+
+def _version_key(name: str):
+    """Natural sort key, so v10 sorts after v9 and 1.10 after 1.9."""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+LoadedModel = namedtuple(
+    "LoadedModel", ["version", "model", "encoders", "tables", "signature", "loaded_at"]
+)
+
+
+class CategoryTable:
+    """
+    Immutable lookup compiled from a fitted LabelEncoder.
+
+    encode() maps a batch of raw values to the encoder's integer codes with
+    one searchsorted call. Values the encoder never saw map to unknown_code
+    (len(classes_)), the code the old append-on-miss behaviour produced for
+    the first unseen value, without mutating shared state.
+    """
+
+    __slots__ = ("classes", "codes", "unknown_code")
+
+    def __init__(self, classes):
+        classes = np.asarray(classes).astype(str)
+        order = np.argsort(classes, kind="stable")
+        self.classes = classes[order]
+        self.codes = order.astype(np.int64)
+        self.unknown_code = len(classes)
+        self.classes.setflags(write=False)
+        self.codes.setflags(write=False)
+
+    def encode(self, values) -> np.ndarray:
+        values = np.asarray(values).astype(str)
+        if len(self.classes) == 0:
+            return np.full(values.shape, self.unknown_code, dtype=np.int64)
+        idx = np.minimum(np.searchsorted(self.classes, values), len(self.classes) - 1)
+        hit = self.classes[idx] == values
+        return np.where(hit, self.codes[idx], self.unknown_code)
+
+
+class ModelRegistry:
+    """
+    Lazily loads versioned risk-model artifacts and hot-swaps them in place.
+
+    Layout under model_dir:
+        risk_model_hgb.pkl, encoders.pkl             -> version "default"
+        <version>/risk_model_hgb.pkl, encoders.pkl   -> a versioned artifact
+        CURRENT                                      -> name of the active version
+
+    The active version is the pinned version if given, else the one named in
+    CURRENT, else the newest versioned directory (by natural sort, so v10
+    is newer than v9), else "default". Every
+    reload_interval seconds the registry re-resolves it and reloads when the
+    version or the artifact files change, so a deploy only has to drop a new
+    directory and rewrite CURRENT.
+    """
+
+    def __init__(self, model_dir: str = RISK_MODEL_DIR, pinned_version: str = RISK_MODEL_VERSION,
+                 reload_interval: float = RISK_MODEL_RELOAD_INTERVAL):
+        self.model_dir = model_dir
+        self.pinned_version = pinned_version
+        self.reload_interval = reload_interval
+        self._current = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _artifact_dir(self, version: str) -> str:
+        if version == DEFAULT_VERSION:
+            return self.model_dir
+        return os.path.join(self.model_dir, version)
+
+    def versions(self):
+        found = []
+        if os.path.isfile(os.path.join(self.model_dir, MODEL_FILE)):
+            found.append(DEFAULT_VERSION)
+        if os.path.isdir(self.model_dir):
+            found.extend(sorted(
+                (name for name in os.listdir(self.model_dir)
+                 if os.path.isfile(os.path.join(self.model_dir, name, MODEL_FILE))),
+                key=_version_key,
+            ))
+        return found
+
+    def _resolve_version(self) -> str:
+        if self.pinned_version:
+            return self.pinned_version
+        current_file = os.path.join(self.model_dir, CURRENT_FILE)
+        if os.path.isfile(current_file):
+            with open(current_file) as f:
+                version = f.read().strip()
+            if version:
+                return version
+        versioned = [v for v in self.versions() if v != DEFAULT_VERSION]
+        return versioned[-1] if versioned else DEFAULT_VERSION
+
+    def _signature(self, version: str):
+        directory = self._artifact_dir(version)
+        return (
+            version,
+            os.path.getmtime(os.path.join(directory, MODEL_FILE)),
+            os.path.getmtime(os.path.join(directory, ENCODERS_FILE)),
+        )
+
+    def _load(self, version: str, signature) -> LoadedModel:
+        directory = self._artifact_dir(version)
+        model = joblib.load(os.path.join(directory, MODEL_FILE))
+        encoders = joblib.load(os.path.join(directory, ENCODERS_FILE))
+        tables = {name: CategoryTable(encoders[name].classes_) for name in CATEGORICAL_FEATURES}
+        return LoadedModel(version, model, encoders, tables, signature, time.time())
+
+    def get(self) -> LoadedModel:
+        """
+        Return the active model, loading or swapping it if needed.
+        Raises if nothing has been loaded yet and the artifacts cannot be read.
+        """
+        current = self._current
+        if current is not None and time.monotonic() - self._checked_at < self.reload_interval:
+            return current
+
+        with self._lock:
+            current = self._current
+            if current is not None and time.monotonic() - self._checked_at < self.reload_interval:
+                return current
+            try:
+                version = self._resolve_version()
+                signature = self._signature(version)
+                if current is None or current.signature != signature:
+                    # Requests keep using the old model until the new one is fully loaded
+                    self._current = self._load(version, signature)
+            except Exception as e:
+                if current is None:
+                    raise
+                print(f"Risk model reload failed, keeping version {current.version}: {e}")
+            self._checked_at = time.monotonic()
+            return self._current
+
+    def info(self) -> dict:
+        current = self._current
+        return {
+            "available_versions": self.versions(),
+            "active_version": current.version if current else None,
+            "loaded_at": current.loaded_at if current else None,
+        }
+
+
+risk_model_registry = ModelRegistry()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Text
 from sqlalchemy.orm import relationship
 from database import Base
 import uuid
@@ -54,3 +54,48 @@ class Application(Base):
     status = Column(String(50), default="pending")
     patient = relationship("Patient", back_populates="applications")
     insurer = relationship("Insurer", back_populates="applications")
+
+
+#District coverage aggregate
+class DistrictStats(Base):
+    __tablename__ = "DISTRICT_STATS"
+
+    district = Column(String(100), primary_key=True)
+    provider_count = Column(Integer, nullable=False, default=0)
+    patient_count = Column(Integer, nullable=False, default=0)
+
+
+#Email outbox
+class EmailOutbox(Base):
+    __tablename__ = "EMAIL_OUTBOX"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    recipient = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(20), default="pending")
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    claimed_by = Column(String(36), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    last_error = Column(String(1000), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+
+#Clinical note analysis jobs
+class ClinicalNoteJob(Base):
+    __tablename__ = "CLINICAL_NOTE_JOBS"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    patient_id = Column(String(36), nullable=False)
+    filename = Column(String(255), nullable=False)
+    status = Column(String(20), default="queued")  # queued, running, succeeded, failed
+    result = Column(Text, nullable=True)  # JSON
+    error = Column(String(1000), nullable=True)
+    timings = Column(Text, nullable=True)  # JSON, seconds per stage
+    worker_id = Column(String(36), nullable=True)  # process that holds the upload
+    heartbeat_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
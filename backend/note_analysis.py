@@ -0,0 +1,236 @@
+import asyncio
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from database import SessionLocal
+from models import Patient
+from ollama_client import ollama_client, OllamaUnavailable
+from note_cache import note_cache
+from note_upload import NoteUpload
+from extraction import SUPPORTED_EXTENSIONS, extract_text, extract_pdf_text, run_in_extraction_pool
+from config import settings
+
+NOTE_CHUNK_TOKENS = settings.note_chunk_tokens
+NOTE_CHUNK_OVERLAP_TOKENS = settings.note_chunk_overlap_tokens
+NOTE_MAX_CHUNKS = settings.note_max_chunks
+
+# Rough English words-to-tokens ratio for the Mistral tokenizer
+TOKENS_PER_WORD = 1.3
+RISK_ORDER = {"low": 0, "moderate": 1, "high": 2}
+
+NOT_RELATED = "The document is not related to mental health or is invalid."
+
+
+def note_extension(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Unsupported file format. Only PDF, DOCX, JPG, and PNG allowed.")
+    return ext
+
+
+@contextmanager
+def stage(timings: dict, name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round(time.perf_counter() - start, 4)
+
+
+async def identify_disease_and_risk(text: str) -> str:
+    """
+    Run Ollama mistral model for NLP disease identification.
+    Distinguishes between mental health and non-mental health notes.
+    """
+    prompt = f"""
+You are a mental health medical NLP assistant.
+
+From the following clinical note, determine if it relates to mental health.
+
+If it does, identify the disease mentioned, determine the risk level, and provide a medical suggestion.
+
+If it does not, return the message: "{NOT_RELATED}"
+
+Present the output in this exact structured format only if the note is related to mental health:
+
+Disease Name: [Name of the disease]
+Risk Level: [Low / Moderate / High]
+Suggestion: [Provide a short actionable medical suggestion]
+
+Clinical Note:
+\"\"\"{text}\"\"\"
+"""
+
+    try:
+        output = await ollama_client.generate(prompt)
+    except OllamaUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Clinical NLP service unavailable: {e}")
+
+    if not output.strip():
+        return NOT_RELATED
+
+    return output.strip()
+
+
+def parse_analysis(result: str):
+    """Pull (disease_name, risk_level, suggestion) out of the model output."""
+    fields = {}
+    for line in result.splitlines():
+        for label in ("Disease Name:", "Risk Level:", "Suggestion:"):
+            if line.startswith(label) and label not in fields:
+                fields[label] = line.split(":", 1)[1].strip()
+    return fields.get("Disease Name:"), fields.get("Risk Level:"), fields.get("Suggestion:")
+
+
+def chunk_note(text: str) -> list:
+    """
+    Split a note into overlapping windows of about NOTE_CHUNK_TOKENS tokens.
+    Notes with more than NOTE_MAX_CHUNKS windows are sampled evenly from
+    start to end so model latency stays bounded for any document length.
+    """
+    words = text.split()
+    size = max(1, int(NOTE_CHUNK_TOKENS / TOKENS_PER_WORD))
+    overlap = min(size - 1, int(NOTE_CHUNK_OVERLAP_TOKENS / TOKENS_PER_WORD))
+    step = size - overlap
+
+    chunks = [" ".join(words[i:i + size]) for i in range(0, max(len(words) - overlap, 1), step)]
+    if len(chunks) > NOTE_MAX_CHUNKS:
+        last = len(chunks) - 1
+        spread = max(NOTE_MAX_CHUNKS - 1, 1)
+        picks = sorted({round(i * last / spread) for i in range(NOTE_MAX_CHUNKS)})
+        chunks = [chunks[i] for i in picks]
+    return chunks
+
+
+def reduce_analyses(outputs: list) -> str:
+    """
+    Combine per-chunk outputs into one answer in the same structured format:
+    the most frequently named disease (ties go to the higher risk), and the
+    highest risk level and its suggestion among the chunks naming that
+    disease. The Risk Level line is omitted if none of them gave one.
+    """
+    findings = []
+    for output in outputs:
+        if output.strip().startswith("The document is not related"):
+            continue
+        disease_name, risk_level, suggestion = parse_analysis(output)
+        if not disease_name or not suggestion or disease_name.lower() == "n/a" or suggestion.lower() == "n/a":
+            continue
+        findings.append((disease_name, risk_level or None, suggestion, RISK_ORDER.get((risk_level or "").lower(), -1)))
+
+    if not findings:
+        return NOT_RELATED
+
+    votes = Counter(disease.casefold() for disease, _, _, _ in findings)
+    top_risk = {}
+    for disease, _, _, rank in findings:
+        top_risk[disease.casefold()] = max(top_risk.get(disease.casefold(), -1), rank)
+    chosen = max(votes, key=lambda d: (votes[d], top_risk[d]))
+
+    agreeing = [f for f in findings if f[0].casefold() == chosen]
+    disease_name, risk_level, suggestion, _ = max(agreeing, key=lambda f: (f[1] is not None, f[3]))
+
+    lines = [f"Disease Name: {disease_name}"]
+    if risk_level:
+        lines.append(f"Risk Level: {risk_level}")
+    lines.append(f"Suggestion: {suggestion}")
+    return "\n".join(lines)
+
+
+async def analyze_text(text: str, timings: dict) -> str:
+    """Map the note's chunks through the model concurrently, then reduce."""
+    chunks = chunk_note(text)
+    timings["chunks"] = len(chunks)
+    if len(chunks) == 1:
+        return await identify_disease_and_risk(chunks[0])
+
+    # ollama_client's semaphore bounds how many chunks hit the model at once
+    outputs = await asyncio.gather(*[identify_disease_and_risk(chunk) for chunk in chunks], return_exceptions=True)
+    succeeded = [output for output in outputs if isinstance(output, str)]
+    if not succeeded:
+        raise outputs[0]
+    return reduce_analyses(succeeded)
+
+
+async def analyze_note(upload: NoteUpload, ext: str, timings: dict) -> dict:
+    """
+    Extract and analyse one clinical note. Parsing runs in the extraction
+    process pool, the model call is awaited, and both results are cached by
+    content hash so re-uploads skip straight to the patient update.
+    Raises HTTPException for notes that cannot be analysed.
+    """
+    with stage(timings, "cache_lookup"):
+        digest = upload.digest
+        cached = await run_in_threadpool(note_cache.get, digest) or {}
+
+    extracted_text = cached.get("text")
+    if extracted_text is None:
+        with stage(timings, "extract"):
+            if ext == ".pdf":
+                timings["pdf"] = {}
+                extracted_text = await extract_pdf_text(upload.source, timings["pdf"])
+            else:
+                extracted_text = await run_in_extraction_pool(extract_text, ext, upload.source)
+        await run_in_threadpool(note_cache.put, digest, text=extracted_text)
+
+    if not extracted_text:
+        raise HTTPException(status_code=400, detail="No text extracted from the file.")
+
+    analysis = cached.get("analysis") or {}
+    result = analysis.get("output") if analysis.get("model") == ollama_client.model else None
+    cache_hit = result is not None
+    if not cache_hit:
+        with stage(timings, "analyze"):
+            result = await analyze_text(extracted_text, timings)
+
+    if result.strip().startswith("The document is not related"):
+        raise HTTPException(status_code=400, detail=NOT_RELATED)
+
+    disease_name, risk_level, suggestion = parse_analysis(result)
+
+    if not disease_name or not suggestion or disease_name.lower() == "n/a" or suggestion.lower() == "n/a":
+        raise HTTPException(status_code=400, detail="Invalid document. Please upload a proper clinical note.")
+
+    # Only usable answers are cached; a rejection (possibly from a transient
+    # empty model reply) must not stick to every re-upload of the file
+    if not cache_hit:
+        await run_in_threadpool(
+            note_cache.put, digest, analysis={"model": ollama_client.model, "output": result}
+        )
+
+    return {
+        "disease_name": disease_name,
+        "risk_level": risk_level or None,
+        "suggestion": suggestion,
+        "raw_output": result,
+        "cached": cache_hit,
+    }
+
+
+def update_patient_diagnosis(patient_id: str, disease_name: str, risk_level: str = None):
+    # A note without a risk level leaves the stored one untouched
+    values = {"disease_name": disease_name}
+    if risk_level:
+        values["riskLevel"] = risk_level
+    db = SessionLocal()
+    try:
+        updated = (
+            db.query(Patient)
+            .filter(Patient.id == patient_id)
+            .update(values, synchronize_session=False)
+        )
+        if not updated:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        db.commit()
+    finally:
+        db.close()
+
+
+async def analyze_and_apply(patient_id: str, upload: NoteUpload, ext: str, timings: dict) -> dict:
+    result = await analyze_note(upload, ext, timings)
+    with stage(timings, "store"):
+        await run_in_threadpool(update_patient_diagnosis, patient_id, result["disease_name"], result["risk_level"])
+    return {"patient_id": patient_id, **result}
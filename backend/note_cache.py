@@ -0,0 +1,154 @@
+# note_cache.py
+import json
+import os
+import tempfile
+import threading
+from cachetools import LRUCache
+from config import settings
+
+NOTE_CACHE_DIR = settings.note_cache_dir
+NOTE_CACHE_MEMORY_SIZE = settings.note_cache_memory_size
+NOTE_CACHE_MAX_BYTES = settings.note_cache_max_bytes
+NOTE_CACHE_MAX_ENTRIES = settings.note_cache_max_entries
+
+
+class NoteCache:
+    """
+    Content-addressed cache of clinical note results, keyed by the SHA-256
+    of the uploaded file. An entry holds the extracted text and, once the
+    note has been analysed, the model output:
+
+        {"text": "...", "analysis": {"model": "mistral", "output": "..."}}
+
+    Entries live in a small in-memory LRU in front of one JSON file per
+    digest on disk, shared by every worker process: lookups read the file
+    directly, and the directory as a whole is bounded by total bytes and
+    entry count, evicting the least recently used files first.
+    Safe to call from worker threads.
+    """
+
+    def __init__(self, directory: str, memory_size: int, max_bytes: int, max_entries: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._memory = LRUCache(maxsize=memory_size)
+        self._lock = threading.Lock()
+        self._index = None  # digest -> size in bytes, loaded on first use
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def _scan(self) -> dict:
+        """digest -> (size, mtime) for every entry on disk, from all workers."""
+        entries = {}
+        for item in os.scandir(self.directory):
+            if item.name.endswith(".json"):
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                entries[item.name[:-5]] = (stat.st_size, stat.st_mtime)
+        return entries
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self._index = {digest: size for digest, (size, _) in self._scan().items()}
+
+    def get(self, digest: str):
+        with self._lock:
+            entry = self._memory.get(digest)
+            if entry is None:
+                entry = self._read(digest)
+                if entry is not None:
+                    self._memory[digest] = entry
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, digest: str, **fields):
+        """Merge fields into the entry for digest and persist it."""
+        with self._lock:
+            entry = dict(self._memory.get(digest) or self._read(digest) or {})
+            entry.update(fields)
+            self._memory[digest] = entry
+            self._write(digest, entry)
+
+    def _read(self, digest: str):
+        self._load_index()
+        # Always check disk: another worker may have written the entry
+        path = self._path(digest)
+        try:
+            with open(path, encoding="utf-8") as f:
+                size = os.fstat(f.fileno()).st_size
+                entry = json.load(f)
+            os.utime(path)  # mtime doubles as the LRU clock for eviction
+        except (OSError, ValueError):
+            self._index.pop(digest, None)
+            return None
+        self._index[digest] = size
+        return entry
+
+    def _write(self, digest: str, entry: dict):
+        self._load_index()
+        data = json.dumps(entry).encode("utf-8")
+        # Write-then-rename so readers never see a half-written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(digest))
+        except OSError as e:
+            print(f"Note cache write failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._index[digest] = len(data)
+        self._evict()
+
+    def _evict(self):
+        # Bounds apply to the shared directory, so count what is on disk
+        # rather than what this process has seen
+        entries = self._scan()
+        self._index = {digest: size for digest, (size, _) in entries.items()}
+        total = sum(self._index.values())
+        if total <= self.max_bytes and len(self._index) <= self.max_entries:
+            return
+
+        for digest in sorted(entries, key=lambda d: entries[d][1]):
+            if total <= self.max_bytes and len(self._index) <= self.max_entries:
+                break
+            total -= self._index.pop(digest)
+            self._memory.pop(digest, None)
+            self.evictions += 1
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / (lookups or 1),
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._index or {}),
+                "disk_bytes": sum((self._index or {}).values()),
+            }
+
+
+note_cache = NoteCache(
+    NOTE_CACHE_DIR,
+    memory_size=NOTE_CACHE_MEMORY_SIZE,
+    max_bytes=NOTE_CACHE_MAX_BYTES,
+    max_entries=NOTE_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import tempfile
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+from starlette.formparsers import MultiPartParser
+from config import settings
+
+NOTE_UPLOAD_MAX_BYTES = settings.note_upload_max_bytes
+NOTE_UPLOAD_SPOOL_BYTES = settings.note_upload_spool_bytes
+NOTE_UPLOAD_TMP_DIR = settings.note_upload_tmp_dir
+
+READ_CHUNK_BYTES = 1024 * 1024
+# Multipart boundaries and form fields on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+MAX_REQUEST_BYTES = NOTE_UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD_BYTES
+
+# Starlette parses each uploaded file into a SpooledTemporaryFile that rolls
+# over to disk past max_file_size (1 MB by default). Match our spool limit so
+# notes we keep in memory are not written to disk while the form is parsed.
+MultiPartParser.max_file_size = max(MultiPartParser.max_file_size, NOTE_UPLOAD_SPOOL_BYTES)
+
+
+def _too_large():
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large. Clinical notes are limited to {NOTE_UPLOAD_MAX_BYTES // (1024 * 1024)} MB.",
+    )
+
+
+class UploadLimitRoute(APIRoute):
+    """
+    Rejects oversized requests before FastAPI parses the multipart body:
+    from Content-Length when it is declared, otherwise by counting body
+    bytes as they are received, so a chunked upload is cut off at the limit
+    instead of being spooled to disk in full.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request):
+            length = request.headers.get("content-length")
+            if length and length.isdigit() and int(length) > MAX_REQUEST_BYTES:
+                raise _too_large()
+
+            receive = request._receive
+            received = 0
+
+            async def limited_receive():
+                nonlocal received
+                message = await receive()
+                if message["type"] == "http.request":
+                    received += len(message.get("body", b""))
+                    if received > MAX_REQUEST_BYTES:
+                        raise _too_large()
+                return message
+
+            request._receive = limited_receive
+            return await handler(request)
+
+        return limited_handler
+
+
+class NoteUpload:
+    """
+    A size-checked, hashed upload. Files up to NOTE_UPLOAD_SPOOL_BYTES stay
+    in memory as bytes. Larger ones have already been spooled to an unnamed
+    temp file by Starlette; they are copied to a uniquely named temp file so
+    they can be handed to the extraction pool by path.
+    Call close() (or use as a context manager) to remove the temp file.
+    """
+
+    def __init__(self, digest: str, size: int, content: bytes = None, path: str = None):
+        self.digest = digest
+        self.size = size
+        self.content = content
+        self.path = path
+
+    @property
+    def source(self):
+        """Picklable input for the parsers: the bytes or the temp file path."""
+        return self.path if self.path is not None else self.content
+
+    def close(self):
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def read_note_upload(file: UploadFile, ext: str) -> NoteUpload:
+    hasher = hashlib.sha256()
+    buffer = bytearray()
+    spool = None
+    size = 0
+    try:
+        while True:
+            chunk = await file.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > NOTE_UPLOAD_MAX_BYTES:
+                raise _too_large()
+            hasher.update(chunk)
+            if spool is None:
+                buffer += chunk
+                if len(buffer) > NOTE_UPLOAD_SPOOL_BYTES:
+                    spool = await run_in_threadpool(
+                        tempfile.NamedTemporaryFile, prefix="note_", suffix=ext, dir=NOTE_UPLOAD_TMP_DIR, delete=False
+                    )
+                    await run_in_threadpool(spool.write, bytes(buffer))
+                    buffer = None
+            else:
+                await run_in_threadpool(spool.write, chunk)
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.remove(spool.name)
+        raise
+
+    if spool is None:
+        return NoteUpload(hasher.hexdigest(), size, content=bytes(buffer))
+    await run_in_threadpool(spool.close)
+    return NoteUpload(hasher.hexdigest(), size, path=spool.name)
@@ -0,0 +1,83 @@
+# ollama_client.py
+import asyncio
+import httpx
+
+from config import settings
+
+
+class OllamaUnavailable(Exception):
+    pass
+
+
+class OllamaClient:
+    """
+    Keep-alive HTTP client for the Ollama /api/generate endpoint.
+
+    At most max_concurrency generations run at once; further callers wait on
+    the semaphore. keep_alive tells Ollama how long to keep the model loaded
+    between calls so each request skips the model load.
+    """
+
+    def __init__(
+        self,
+        base_url: str = settings.ollama_base_url,
+        model: str = settings.ollama_model,
+        max_concurrency: int = settings.ollama_max_concurrency,
+        timeout: float = settings.ollama_timeout,
+        keep_alive: str = settings.ollama_keep_alive,
+    ):
+        self.base_url = base_url
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=5),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+        return self._client
+
+    async def generate(self, prompt: str, timeout: float = None) -> str:
+        """
+        Return the model's completion for prompt.
+        Raises OllamaUnavailable if the server cannot be reached or errors.
+        """
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+        }
+        async with self._semaphore:
+            try:
+                response = await self._http().post(
+                    "/api/generate", json=payload, timeout=timeout or self.timeout
+                )
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                raise OllamaUnavailable(str(e) or type(e).__name__)
+        return response.json().get("response", "")
+
+    def warm_up(self):
+        """Ask Ollama to load the model now (a generate call with no prompt)."""
+        with httpx.Client(base_url=self.base_url, timeout=self.timeout) as client:
+            client.post(
+                "/api/generate", json={"model": self.model, "keep_alive": self.keep_alive}
+            ).raise_for_status()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+ollama_client = OllamaClient()
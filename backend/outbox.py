@@ -0,0 +1,233 @@
+# outbox.py
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from sqlalchemy import and_, or_
+
+from config import settings
+from database import SessionLocal
+from models import EmailOutbox
+from utils import EMAIL_USER, EMAIL_PASSWORD, SMTP_SERVER, SMTP_PORT, SMTP_STARTTLS
+
+OUTBOX_BATCH_SIZE = settings.outbox_batch_size
+OUTBOX_POLL_INTERVAL = settings.outbox_poll_interval
+OUTBOX_MAX_ATTEMPTS = settings.outbox_max_attempts
+OUTBOX_BACKOFF_BASE = settings.outbox_backoff_base
+OUTBOX_BACKOFF_MAX = settings.outbox_backoff_max
+OUTBOX_CLAIM_TIMEOUT = settings.outbox_claim_timeout
+SMTP_IDLE_TIMEOUT = settings.smtp_idle_timeout
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff: base, 2*base, 4*base, ... capped at OUTBOX_BACKOFF_MAX."""
+    return timedelta(seconds=min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX))
+
+
+class OutboxWorker:
+    """
+    Background thread that drains EMAIL_OUTBOX over one persistent SMTP session.
+
+    Rows are claimed with a conditional UPDATE so several API workers can run
+    a drainer against the same table without sending a message twice; each
+    result is committed as soon as the message is sent.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        smtp_server: str = SMTP_SERVER,
+        smtp_port: int = SMTP_PORT,
+        username: str = EMAIL_USER,
+        password: str = EMAIL_PASSWORD,
+        starttls: bool = SMTP_STARTTLS,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+    ):
+        self.session_factory = session_factory
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.sender = username
+        self._smtp = None
+        self._smtp_used_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"sent": 0, "retried": 0, "failed": 0, "batches": 0, "connects": 0}
+
+    #Lifecycle
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._close_smtp()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.drain_once()
+            except Exception as e:
+                print(f"Email outbox error: {e}")
+                sent = 0
+            if sent < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    #SMTP session
+    def _connection(self):
+        if self._smtp is not None and time.monotonic() - self._smtp_used_at > SMTP_IDLE_TIMEOUT:
+            # Servers drop idle sessions; probe before reusing
+            try:
+                self._smtp.noop()
+            except OSError:
+                self._close_smtp()
+
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+            if self.starttls:
+                smtp.starttls()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+            self._smtp = smtp
+            self.stats["connects"] += 1
+        return self._smtp
+
+    def _close_smtp(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _deliver(self, row: EmailOutbox):
+        msg = MIMEMultipart()
+        msg["From"] = self.sender
+        msg["To"] = row.recipient
+        msg["Subject"] = row.subject
+        msg.attach(MIMEText(row.body, "plain"))
+
+        try:
+            self._connection().sendmail(self.sender, row.recipient, msg.as_string())
+        except OSError:
+            # SMTPException subclasses OSError; reconnect on the next message
+            self._close_smtp()
+            raise
+        self._smtp_used_at = time.monotonic()
+
+    #Draining
+    def _claim(self, db):
+        now = datetime.utcnow()
+        claimable = or_(
+            and_(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now),
+            # A worker died mid-batch; take its rows back after the claim timeout
+            and_(
+                EmailOutbox.status == "sending",
+                EmailOutbox.claimed_at < now - timedelta(seconds=OUTBOX_CLAIM_TIMEOUT),
+            ),
+        )
+        ids = [
+            row_id for (row_id,) in
+            db.query(EmailOutbox.id)
+            .filter(claimable)
+            .order_by(EmailOutbox.created_at)
+            .limit(self.batch_size)
+        ]
+        if not ids:
+            return None, []
+
+        token = str(uuid.uuid4())
+        db.query(EmailOutbox).filter(EmailOutbox.id.in_(ids), claimable).update(
+            {
+                EmailOutbox.status: "sending",
+                EmailOutbox.claimed_by: token,
+                EmailOutbox.claimed_at: now,
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+        rows = db.query(EmailOutbox).filter(EmailOutbox.claimed_by == token).all()
+        # Detached, so the per-row commits below don't reload every row
+        db.expunge_all()
+        return token, rows
+
+    def _renew_claim(self, db, token: str) -> bool:
+        """Push claimed_at forward for the rows still held; False if they were reclaimed."""
+        renewed = (
+            db.query(EmailOutbox)
+            .filter(EmailOutbox.claimed_by == token, EmailOutbox.status == "sending")
+            .update({EmailOutbox.claimed_at: datetime.utcnow()}, synchronize_session=False)
+        )
+        db.commit()
+        return bool(renewed)
+
+    def _record_result(self, db, row: EmailOutbox, token: str, values: dict):
+        # Only while we still hold the claim, so a reclaiming worker's state wins
+        db.query(EmailOutbox).filter(EmailOutbox.id == row.id, EmailOutbox.claimed_by == token).update(
+            {**values, EmailOutbox.claimed_by: None, EmailOutbox.claimed_at: None},
+            synchronize_session=False,
+        )
+        db.commit()
+
+    def drain_once(self) -> int:
+        """
+        Claim and send one batch. Each row's outcome is committed right after
+        its delivery attempt, so a crash mid-batch re-sends at most the one
+        message in flight, and the claim is renewed during long batches so
+        other workers don't take rows that are still being sent.
+        Returns the number of rows processed.
+        """
+        db = self.session_factory()
+        try:
+            token, rows = self._claim(db)
+            if not rows:
+                return 0
+
+            renewed_at = time.monotonic()
+            processed = 0
+            for row in rows:
+                if time.monotonic() - renewed_at > OUTBOX_CLAIM_TIMEOUT / 2:
+                    if not self._renew_claim(db, token):
+                        print("Email outbox claim expired mid-batch; leaving the rest to other workers")
+                        break
+                    renewed_at = time.monotonic()
+
+                try:
+                    self._deliver(row)
+                except Exception as e:
+                    attempts = (row.attempts or 0) + 1
+                    values = {EmailOutbox.attempts: attempts, EmailOutbox.last_error: str(e)[:1000]}
+                    if attempts >= OUTBOX_MAX_ATTEMPTS:
+                        values[EmailOutbox.status] = "failed"
+                        self.stats["failed"] += 1
+                        print(f"Giving up on email to {row.recipient}: {e}")
+                    else:
+                        values[EmailOutbox.status] = "pending"
+                        values[EmailOutbox.next_attempt_at] = datetime.utcnow() + retry_delay(attempts)
+                        self.stats["retried"] += 1
+                else:
+                    values = {EmailOutbox.status: "sent", EmailOutbox.sent_at: datetime.utcnow()}
+                    self.stats["sent"] += 1
+                self._record_result(db, row, token, values)
+                processed += 1
+
+            self.stats["batches"] += 1
+            return processed
+        finally:
+            db.close()
+
+
+outbox_worker = OutboxWorker()
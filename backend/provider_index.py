@@ -0,0 +1,97 @@
+# provider_index.py
+import threading
+import time
+from collections import namedtuple
+
+from config import settings
+from database import SessionLocal
+from models import Insurer
+
+# Full reload interval; bounds staleness for changes made by other workers
+PROVIDER_INDEX_TTL = settings.provider_index_ttl
+
+Provider = namedtuple(
+    "Provider", ["id", "companyName", "email", "contactNo", "address", "district", "country"]
+)
+
+_lock = threading.Lock()
+# Held by the one caller reloading the index; others keep reading the old one
+_refresh_lock = threading.Lock()
+_by_district = {}
+_loaded_at = None
+# One list per reload in progress, collecting upserts made while it queries
+_pending_upserts = []
+
+
+def _to_provider(insurer) -> Provider:
+    if isinstance(insurer, dict):
+        return Provider(**{field: insurer[field] for field in Provider._fields})
+    return Provider(*(getattr(insurer, field) for field in Provider._fields))
+
+
+def _apply(index: dict, provider: Provider):
+    for providers in index.values():
+        providers.pop(provider.id, None)
+    index.setdefault(provider.district, {})[provider.id] = provider
+
+
+def warm_provider_index():
+    """Load every insurer into the district index in one query."""
+    global _by_district, _loaded_at
+    upserts = []
+    with _lock:
+        _pending_upserts.append(upserts)
+    try:
+        db = SessionLocal()
+        try:
+            rows = db.query(*(getattr(Insurer, field) for field in Provider._fields)).all()
+        finally:
+            db.close()
+    except BaseException:
+        with _lock:
+            _pending_upserts.remove(upserts)
+        raise
+
+    index = {}
+    for row in rows:
+        provider = Provider(*row)
+        index.setdefault(provider.district, {})[provider.id] = provider
+
+    with _lock:
+        _pending_upserts.remove(upserts)
+        # Signups committed after our query would otherwise be lost with the old dict
+        for provider in upserts:
+            _apply(index, provider)
+        _by_district = index
+        _loaded_at = time.monotonic()
+
+
+def upsert_provider(insurer):
+    """Patch the index after an insurer signs up or updates their profile."""
+    provider = _to_provider(insurer)
+    with _lock:
+        _apply(_by_district, provider)
+        for upserts in _pending_upserts:
+            upserts.append(provider)
+
+
+def providers_in_district(district: str):
+    with _lock:
+        loaded = _loaded_at is not None
+        fresh = loaded and time.monotonic() - _loaded_at < PROVIDER_INDEX_TTL
+        if fresh:
+            return list(_by_district.get(district, {}).values())
+
+    # Nothing loaded yet: wait for whoever is loading. Stale: only one caller
+    # reloads, the rest serve the stale index instead of queueing behind it.
+    if _refresh_lock.acquire(blocking=not loaded):
+        try:
+            with _lock:
+                fresh = _loaded_at is not None and time.monotonic() - _loaded_at < PROVIDER_INDEX_TTL
+            if not fresh:
+                warm_provider_index()
+        finally:
+            _refresh_lock.release()
+
+    with _lock:
+        return list(_by_district.get(district, {}).values())
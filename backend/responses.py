@@ -0,0 +1,36 @@
+from decimal import Decimal
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj):
+    # Pydantic models go straight to dicts, skipping jsonable_encoder
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    orjson-backed JSON response, used as the app's default response class.
+
+    Routes returning large payloads can return it directly with pydantic
+    models or plain rows as content; that skips FastAPI's response_model
+    validation and jsonable_encoder pass, which dominate serialisation time.
+    datetimes, dates, UUIDs and numpy values are handled natively by orjson.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,36 +1,25 @@
-import os
+import asyncio
 import jwt
-import google.generativeai as genai
-import snowflake.connector
-from dotenv import load_dotenv
 from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import JSONResponse
-
-load_dotenv()
-
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-
-# Gemini AI 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-ai_model = genai.GenerativeModel("gemini-2.5-flash")
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from responses import FastJSONResponse
+from database import get_raw_connection
+from provider_index import providers_in_district
+from llm import generate_text, stream_text, sse_event, SSE_HEADERS, SingleFlightCache
+from config import settings
+
+SECRET_KEY = settings.secret_key
+ALGORITHM = settings.algorithm
+CARE_SUGGESTION_CACHE_SIZE = settings.care_suggestion_cache_size
+CARE_SUGGESTION_CACHE_TTL = settings.care_suggestion_cache_ttl
+
+# AI care plans depend only on the prompt inputs, so identical inputs share one
+care_suggestion_cache = SingleFlightCache(CARE_SUGGESTION_CACHE_SIZE, CARE_SUGGESTION_CACHE_TTL)
 
 # Router 
 router = APIRouter(prefix="/care", tags=["CareSchedule"])
 
-#snowflake connection
-def get_snowflake_connection():
-    return snowflake.connector.connect(
-        user=os.getenv("SNOWFLAKE_USER"),
-        password=os.getenv("SNOWFLAKE_PASSWORD"),
-        account=os.getenv("SNOWFLAKE_ACCOUNT"),
-        database=os.getenv("SNOWFLAKE_DATABASE"),
-        schema=os.getenv("SNOWFLAKE_SCHEMA"),
-        warehouse=os.getenv("SNOWFLAKE_WAREHOUSE"),
-        role=os.getenv("SNOWFLAKE_ROLE"),
-    )
-
-
 @router.get("/patient/{patient_id}")
 def get_patient(patient_id: str, request: Request):
     token = request.headers.get("Authorization")
@@ -43,17 +32,17 @@ def get_patient(patient_id: str, request: Request):
         raise HTTPException(status_code=401, detail="Invalid token")
 
     try:
-        conn = get_snowflake_connection()
-        cur = conn.cursor()
-        cur.execute("""
+        with get_raw_connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute("""
     SELECT ID, NAME, AGE, GENDER, DISEASE_NAME, riskLevel, moodScore, DISTRICT, COUNTRY
     FROM PATIENTS
     WHERE ID = %s
 """, (patient_id,))
-
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
+                row = cur.fetchone()
+            finally:
+                cur.close()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"DB error: {str(e)}")
 
@@ -73,8 +62,92 @@ def get_patient(patient_id: str, request: Request):
         "country": country
     }
 
+def care_prompt(disease, risk, moodscore, district, country) -> str:
+    return f"""
+You are a professional mental health assistant.
+Analyze and provide a structured treatment plan for this patient:
+
+Patient Info:
+- Disease: {disease}
+- Risk Level: {risk}
+- Mood Score: {moodscore}
+- Location: {district}, {country}
+
+Output Format:
+Suggestion:
+-> Short summary of current condition
+-> Risk level interpretation
+-> Actionable lifestyle changes
+-> Medical treatment recommendation
+-> When to seek immediate help
+Give all suggestions in structured format, do not include emergency contacts.
+"""
+
+
+def _district_providers(district: str):
+    try:
+        return [
+            {
+                "id": p.id,
+                "companyName": p.companyName,
+                "contactNo": p.contactNo,
+                "email": p.email,
+                "address": p.address,
+                "country": p.country,
+            } for p in providers_in_district(district)
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DB error: {str(e)}")
+
+
+def _overall_patient_row(patient_id: str):
+    try:
+        with get_raw_connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute("""
+                    SELECT ID, NAME, AGE, GENDER, "DISEASE_NAME", "riskLevel", "moodScore", "DISTRICT", "COUNTRY"
+                    FROM PATIENTS
+                    WHERE ID = %s
+                """, (patient_id,))
+                return cur.fetchone()
+            finally:
+                cur.close()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DB error: {str(e)}")
+
+
+async def _generate_suggestion(prompt: str) -> str:
+    return (await generate_text(prompt)).strip()
+
+
+async def _suggestion_events(cache_key: str, prompt: str, patient_info: dict, providers: list):
+    yield sse_event("patient", {"patientInfo": patient_info, "providers": providers})
+
+    cached = care_suggestion_cache.get(cache_key)
+    if cached is not None:
+        yield sse_event("token", {"text": cached})
+        yield sse_event("done", {"cached": True})
+        return
+
+    chunks = []
+    try:
+        async for text in stream_text(prompt):
+            chunks.append(text)
+            yield sse_event("token", {"text": text})
+    except Exception as e:
+        yield sse_event("error", {"detail": f"AI generation error: {str(e)}"})
+        return
+    care_suggestion_cache.put(cache_key, "".join(chunks).strip())
+    yield sse_event("done", {"cached": False})
+
+
 @router.post("/patient/overall/{patient_id}")
-async def overall_suggestion(patient_id: str, request: Request):
+async def overall_suggestion(patient_id: str, request: Request, stream: bool = False):
+    """
+    stream=true returns text/event-stream: a `patient` event with patientInfo
+    and providers, `token` events as the plan is generated, then `done`.
+    """
     token = request.headers.get("Authorization")
     if not token:
         raise HTTPException(status_code=401, detail="Authorization token missing")
@@ -87,24 +160,12 @@ async def overall_suggestion(patient_id: str, request: Request):
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    try:
-        conn = get_snowflake_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT ID, NAME, AGE, GENDER, "DISEASE_NAME", "riskLevel", "moodScore", "DISTRICT", "COUNTRY"
-            FROM PATIENTS
-            WHERE ID = %s
-        """, (patient_id,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Patient not found")
-
-        patient_id_db, name, age, gender, disease, risk, moodscore, district, country = row
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"DB error: {str(e)}")
-    finally:
-        cur.close()
-        conn.close()
+    row = await run_in_threadpool(_overall_patient_row, patient_id)
+
+    if not row:
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    patient_id_db, name, age, gender, disease, risk, moodscore, district, country = row
 
     patient_info = {
         "id": patient_id_db,
@@ -118,58 +179,32 @@ async def overall_suggestion(patient_id: str, request: Request):
         "country": country
     }
 
-    prompt = f"""
-You are a professional mental health assistant.
-Analyze and provide a structured treatment plan for this patient:
-
-Patient Info:
-- Disease: {disease}
-- Risk Level: {risk}
-- Mood Score: {moodscore}
-- Location: {district}, {country}
-
-Output Format:
-Suggestion:
--> Short summary of current condition
--> Risk level interpretation
--> Actionable lifestyle changes
--> Medical treatment recommendation
--> When to seek immediate help
-Give all suggestions in structured format, do not include emergency contacts.
-"""
-    try:
-        response = ai_model.generate_content(prompt)
-        suggestion_text = response.text.strip()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"AI generation error: {str(e)}")
-
-    #Fetch insurance providers in same district
-    try:
-        conn = get_snowflake_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT ID, "companyName", "contactNo", "EMAIL", "ADDRESS", "COUNTRY"
-            FROM INSURERS
-            WHERE "DISTRICT" = %s
-        """, (district,))
-        rows = cur.fetchall()
-        providers = [
-            {
-                "id": r[0],
-                "companyName": r[1],
-                "contactNo": r[2],
-                "email": r[3],
-                "address": r[4],
-                "country": r[5],
-            } for r in rows
-        ]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"DB error: {str(e)}")
-    finally:
-        cur.close()
-        conn.close()
+    prompt = care_prompt(disease, risk, moodscore, district, country)
+    cache_key = SingleFlightCache.make_key(disease, risk, moodscore, district, country)
+
+    if stream:
+        providers = await run_in_threadpool(_district_providers, district)
+        return StreamingResponse(
+            _suggestion_events(cache_key, prompt, patient_info, providers),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
+        )
+
+    async def suggestion():
+        try:
+            return await care_suggestion_cache.get_or_create(
+                cache_key, lambda: _generate_suggestion(prompt)
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"AI generation error: {str(e)}")
+
+    #Insurance providers in same district, fetched while the plan generates
+    suggestion_text, providers = await asyncio.gather(
+        suggestion(),
+        run_in_threadpool(_district_providers, district),
+    )
 
-    return JSONResponse(content={
+    return FastJSONResponse(content={
         "suggestion": suggestion_text,
         "providers": providers,
         "patientInfo": patient_info
@@ -1,24 +1,13 @@
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from transformers import pipeline
-import google.generativeai as genai
-from dotenv import load_dotenv
-import os
 
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
+from emotion import classify_emotion
+from llm import generate_text, stream_text, sse_event, SSE_HEADERS
 
 # Router 
 router = APIRouter(prefix="/chatbot", tags=["Chatbot"])
 
-# HuggingFace emotion classifier
-emotion_classifier = pipeline(
-    "text-classification",
-    model="joeddav/distilbert-base-uncased-go-emotions-student"
-)
-
-genai.configure(api_key=API_KEY)
-
 class ChatRequest(BaseModel):
     message: str
 
@@ -26,17 +15,42 @@ class ChatRequest(BaseModel):
 def root():
     return {"message": "Chatbot router running!"}
 
-@router.post("/chat")
-async def chat(req: ChatRequest):
-    user_input = req.message
 
-    emotions = emotion_classifier(user_input)
-    top_emotion = emotions[0]["label"]
-
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content(
+def chat_prompt(top_emotion: str, user_input: str) -> str:
+    return (
         f"User feels {top_emotion}. provide only four lines of reply. "
         f"Respond empathetically and supportively to this: {user_input}"
     )
 
-    return {"bot": response.text, "emotion": top_emotion}
+
+async def _chat_events(top_emotion: str, prompt: str):
+    yield sse_event("emotion", {"emotion": top_emotion})
+    try:
+        async for text in stream_text(prompt):
+            yield sse_event("token", {"text": text})
+    except Exception as e:
+        yield sse_event("error", {"detail": str(e)})
+        return
+    yield sse_event("done", {})
+
+
+@router.post("/chat")
+async def chat(req: ChatRequest, stream: bool = False):
+    """
+    stream=true returns text/event-stream: one `emotion` event, `token`
+    events as the reply is generated, then `done`.
+    """
+    user_input = req.message
+
+    top_emotion = await classify_emotion(user_input)
+    prompt = chat_prompt(top_emotion, user_input)
+
+    if stream:
+        return StreamingResponse(
+            _chat_events(top_emotion, prompt),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
+        )
+
+    bot_reply = await generate_text(prompt)
+    return {"bot": bot_reply, "emotion": top_emotion}
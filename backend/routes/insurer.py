@@ -1,35 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List,Dict
+from typing import List,Dict,Optional
+import csv
+import io
 
 from database import get_db
 from models import Insurer, Patient, Application
-from auth import get_current_user, create_access_token, verify_password,get_password_hash
+from auth import (
+    get_current_user, create_access_token, hash_password,
+    verify_and_update_password, invalidate_principal
+)
 from schemas import (
     InsurerSignup, InsurerLogin, InsurerToken, InsurerResponse,
-    InsurerUpdateRequest, UpdateApplicationStatus,
-    PatientApplicationOut, AppointmentRequest,PatientAppointmentOut
+    InsurerUpdateRequest, UpdateApplicationStatus, BulkApplicationDecision,
+    PatientApplicationOut, PatientApplicationPage, AppointmentRequest,PatientAppointmentOut
 )
-from utils import send_status_email, send_appointment_email
+from utils import queue_status_email, queue_appointment_email, queue_emails, status_email
+from district_stats import record_district_change, get_district_counts, get_all_district_counts
+from provider_index import upsert_provider
+from responses import FastJSONResponse, dumps
 
 #router 
 router = APIRouter(prefix="/insurer", tags=["Insurer"])
 
+# Rows fetched per round-trip when streaming rosters
+ROSTER_STREAM_BATCH = 500
+
 
 #---Insurer Routes---
 
 #Signup
 @router.post("/signup", response_model=InsurerToken)
-def insurer_signup(user: InsurerSignup, db: Session = Depends(get_db)):
-    existing = db.query(Insurer).filter(Insurer.email == user.email).first()
+async def insurer_signup(user: InsurerSignup, db: Session = Depends(get_db)):
+    existing = await run_in_threadpool(
+        lambda: db.query(Insurer).filter(Insurer.email == user.email).first()
+    )
     if existing:
         raise HTTPException(status_code=400, detail="Insurer email already registered")
 
-    hashed_pw = get_password_hash(user.password)
+    hashed_pw = await hash_password(user.password)
     new_insurer = Insurer(**user.dict(exclude={"password"}), password=hashed_pw)
-    db.add(new_insurer)
-    db.commit()
-    db.refresh(new_insurer)
+
+    def save():
+        db.add(new_insurer)
+        record_district_change(db, new_insurer.district, providers=1)
+        db.commit()
+        db.refresh(new_insurer)
+
+    await run_in_threadpool(save)
+    upsert_provider(new_insurer)
 
     token = create_access_token(
         {"sub": new_insurer.email, "role": "insurer", "id": new_insurer.id}
@@ -43,11 +65,23 @@ def insurer_signup(user: InsurerSignup, db: Session = Depends(get_db)):
 
 #Login
 @router.post("/login", response_model=InsurerToken)
-def insurer_login(user: InsurerLogin, db: Session = Depends(get_db)):
-    insurer = db.query(Insurer).filter(Insurer.email == user.email).first()
-    if not insurer or not verify_password(user.password, insurer.password):
+async def insurer_login(user: InsurerLogin, db: Session = Depends(get_db)):
+    insurer = await run_in_threadpool(
+        lambda: db.query(Insurer).filter(Insurer.email == user.email).first()
+    )
+    if not insurer:
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+
+    valid, new_hash = await verify_and_update_password(user.password, insurer.password)
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
+    # Re-hash transparently when BCRYPT_ROUNDS has changed
+    if new_hash:
+        insurer.password = new_hash
+        await run_in_threadpool(db.commit)
+        await run_in_threadpool(db.refresh, insurer)
+
     token = create_access_token(
         {"sub": insurer.email, "role": "insurer", "id": insurer.id}
     )
@@ -61,13 +95,9 @@ def insurer_login(user: InsurerLogin, db: Session = Depends(get_db)):
 #Profile
 @router.get("/profile", response_model=InsurerResponse)
 def get_current_insurer_profile(
-    db: Session = Depends(get_db),
     current_insurer: Insurer = Depends(get_current_user)
 ):
-    insurer = db.query(Insurer).filter(Insurer.id == current_insurer.id).first()
-    if not insurer:
-        raise HTTPException(status_code=404, detail="Insurer not found")
-    return insurer
+    return current_insurer
 
 
 #Update 
@@ -77,15 +107,41 @@ def update_insurer(
     db: Session = Depends(get_db),
     current_insurer: Insurer = Depends(get_current_user)
 ):
-    insurer = db.query(Insurer).filter(Insurer.id == current_insurer.id).first()
-    if not insurer:
-        raise HTTPException(status_code=404, detail="Insurer not found")
-
-    for field, value in update.dict(exclude_unset=True).items():
-        setattr(insurer, field, value)
-
-    db.commit()
-    db.refresh(insurer)
+    changes = update.dict(exclude_unset=True)
+    if changes:
+        # The cached principal may be stale on other workers; the district
+        # deltas must use the value the database holds in this transaction
+        old_district = None
+        if "district" in changes:
+            row = db.query(Insurer.district).filter(Insurer.id == current_insurer.id).first()
+            if not row:
+                raise HTTPException(status_code=404, detail="Insurer not found")
+            old_district = row.district
+        updated = (
+            db.query(Insurer)
+            .filter(Insurer.id == current_insurer.id)
+            .update(changes, synchronize_session=False)
+        )
+        if not updated:
+            raise HTTPException(status_code=404, detail="Insurer not found")
+        if "district" in changes and changes["district"] != old_district:
+            record_district_change(db, old_district, providers=-1)
+            record_district_change(db, changes["district"], providers=1)
+        db.commit()
+        invalidate_principal("insurer", current_insurer.id)
+
+    insurer = {
+        "id": current_insurer.id,
+        "companyName": current_insurer.companyName,
+        "email": current_insurer.email,
+        "contactNo": current_insurer.contactNo,
+        "address": current_insurer.address,
+        "district": current_insurer.district,
+        "country": current_insurer.country,
+    }
+    insurer.update(changes)
+    if changes:
+        upsert_provider(insurer)
     return insurer
 
 
@@ -115,16 +171,12 @@ def update_patient_status(
 
     patient.applnStatus = body.status       
     patient.apptStatus = "pending"          
-    db.commit()
-    db.refresh(patient)
-
     app_record.status = body.status
+    queue_status_email(db, patient.email, patient.name, body.status)
     db.commit()
+    db.refresh(patient)
     db.refresh(app_record)
 
-    send_status_email(patient.email, patient.name, body.status)
-
-
     return {
         "application_id": app_record.id,
         "application_status": app_record.status,
@@ -135,77 +187,215 @@ def update_patient_status(
     }
 
 
-# Application details
-@router.get("/patient-applications", response_model=List[PatientApplicationOut])
-def get_patient_applications(
+#Bulk application decisions
+@router.put("/applications/bulk")
+def bulk_update_patient_status(
+    body: BulkApplicationDecision,
     db: Session = Depends(get_db),
     current_insurer: Insurer = Depends(get_current_user)
 ):
-    applications = db.query(Application).filter(
-        Application.insurer_id == current_insurer.id
-    ).all()
-
-    result = []
+    """
+    Accept or decline many applications in one transaction.
+    Returns one result per submitted decision, in request order.
+    """
+    # application_ids are unique; BulkApplicationDecision rejects duplicates
+    requested = {decision.application_id: decision.status for decision in body.decisions}
+
+    valid = {app_id: s for app_id, s in requested.items() if s in ["accepted", "declined"]}
+
+    found = {}
+    if valid:
+        rows = (
+            db.query(Application.id, Patient.id, Patient.email, Patient.name)
+            .join(Patient, Patient.id == Application.patient_id)
+            .filter(
+                Application.id.in_(list(valid)),
+                Application.insurer_id == current_insurer.id,
+            )
+            .all()
+        )
+        found = {app_id: (patient_id, email, name) for app_id, patient_id, email, name in rows}
 
-    for app_record in applications:
-        patient = db.query(Patient).filter(Patient.id == app_record.patient_id).first()
-        if not patient:
+    for status in ["accepted", "declined"]:
+        app_ids = [app_id for app_id in found if valid[app_id] == status]
+        if not app_ids:
             continue
+        patient_ids = [found[app_id][0] for app_id in app_ids]
 
-        if patient.applnStatus != "pending":
-            continue
+        db.query(Application).filter(Application.id.in_(app_ids)).update(
+            {Application.status: status}, synchronize_session=False
+        )
+        db.query(Patient).filter(Patient.id.in_(patient_ids)).update(
+            {Patient.applnStatus: status, Patient.apptStatus: "pending"},
+            synchronize_session=False,
+        )
 
-        appt_status = patient.apptStatus or "pending"
+    queue_emails(db, [
+        (email, *status_email(name, valid[app_id]))
+        for app_id, (patient_id, email, name) in found.items()
+    ])
+    db.commit()
 
-        result.append(PatientApplicationOut(
-            application_id=app_record.id,
-            patient_id=patient.id,
-            insurer_id=app_record.insurer_id,
-            name=patient.name,
-            age=patient.age,
-            gender=patient.gender,
-            riskLevel=patient.status or "undiagnosed",
-            moodScore=patient.moodScore,
-            apptStatus=appt_status,
-            applnStatus=patient.applnStatus, 
-            showBookBtn=(appt_status == "pending")
-        ))
+    results = []
+    for app_id, status in requested.items():
+        if app_id not in valid:
+            results.append({"application_id": app_id, "success": False, "detail": "Invalid status"})
+        elif app_id not in found:
+            results.append({"application_id": app_id, "success": False, "detail": "Application not found"})
+        else:
+            results.append({
+                "application_id": app_id,
+                "success": True,
+                "application_status": status,
+                "patient_id": found[app_id][0],
+            })
 
-    return result
+    return {"updated": len(found), "results": results}
 
 
-#Appointment details
-@router.get("/patient-appointments", response_model=List[PatientAppointmentOut])
-def get_patient_appointments(
+# Application details
+@router.get("/patient-applications", response_model=PatientApplicationPage)
+def get_patient_applications(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
     db: Session = Depends(get_db),
     current_insurer: Insurer = Depends(get_current_user)
 ):
-    applications = (
+    """
+    Pending applications for the current insurer, one joined query per page.
+    Pass the returned next_cursor back as `cursor` to fetch the next page.
+    """
+    pending = (
+        db.query(Application)
+        .join(Patient, Patient.id == Application.patient_id)
+        .filter(
+            Application.insurer_id == current_insurer.id,
+            Patient.applnStatus == "pending",
+        )
+    )
+
+    total = pending.with_entities(func.count(Application.id)).scalar()
+
+    page = pending.with_entities(
+        Application.id,
+        Application.insurer_id,
+        Patient.id,
+        Patient.name,
+        Patient.age,
+        Patient.gender,
+        Patient.status,
+        Patient.moodScore,
+        Patient.applnStatus,
+    )
+    if cursor:
+        page = page.filter(Application.id > cursor)
+    rows = page.order_by(Application.id).limit(limit + 1).all()
+
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+
+    items = [
+        PatientApplicationOut(
+            application_id=app_id,
+            patient_id=patient_id,
+            insurer_id=insurer_id,
+            name=name,
+            age=age,
+            gender=gender,
+            riskLevel=status or "undiagnosed",
+            moodScore=mood_score,
+            applnStatus=appln_status,
+        )
+        for app_id, insurer_id, patient_id, name, age, gender, status, mood_score, appln_status
+        in rows[:limit]
+    ]
+
+    # Items are already validated models; serialise them directly with orjson
+    return FastJSONResponse(content={"items": items, "total": total, "next_cursor": next_cursor})
+
+
+#Appointment details
+def _appointment_rows(db: Session, insurer_id: str):
+    """
+    Yield appointment rows one at a time, fetching ROSTER_STREAM_BATCH rows
+    per round-trip so memory stays flat regardless of roster size.
+    """
+    rows = (
         db.query(
-            Application.id.label("application_id"), 
-            Patient
+            Application.id,
+            Patient.id,
+            Patient.name,
+            Patient.age,
+            Patient.gender,
+            Patient.riskLevel,
+            Patient.moodScore,
+            Patient.status,
+            Patient.apptStatus,
         )
         .join(Patient, Patient.id == Application.patient_id)
-        .filter(Application.insurer_id == current_insurer.id)
-        .all()
+        .filter(Application.insurer_id == insurer_id)
+        .yield_per(ROSTER_STREAM_BATCH)
     )
+    for app_id, patient_id, name, age, gender, risk, mood, status, appt_status in rows:
+        yield {
+            "patient_id": str(patient_id),
+            "application_id": str(app_id),
+            "name": name,
+            "age": age,
+            "gender": gender,
+            "riskLevel": risk or "unknown",
+            "moodScore": int(mood or 0),
+            "status": status,
+            "apptStatus": appt_status or "pending",
+        }
+
+
+def _ndjson_lines(rows):
+    batch = []
+    for row in rows:
+        batch.append(dumps(row))
+        if len(batch) == ROSTER_STREAM_BATCH:
+            yield b"\n".join(batch) + b"\n"
+            batch = []
+    if batch:
+        yield b"\n".join(batch) + b"\n"
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(PatientAppointmentOut.__fields__))
+    writer.writeheader()
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % ROSTER_STREAM_BATCH == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
 
-    result = []
-    for app_id, patient in applications:
-        result.append(
-            PatientAppointmentOut(
-                patient_id=str(patient.id),
-                application_id=str(app_id),   
-                name=patient.name,
-                age=patient.age,
-                gender=patient.gender,
-                riskLevel=patient.riskLevel or "unknown",
-                moodScore=patient.moodScore or 0,
-                status=patient.status,
-                apptStatus=patient.apptStatus or "pending",
-            )
+
+@router.get("/patient-appointments", response_model=List[PatientAppointmentOut])
+def get_patient_appointments(
+    format: str = Query("json", regex="^(json|ndjson|csv)$"),
+    db: Session = Depends(get_db),
+    current_insurer: Insurer = Depends(get_current_user)
+):
+    """
+    format=json returns the full list; ndjson and csv stream the roster
+    incrementally for large insurers.
+    """
+    rows = _appointment_rows(db, current_insurer.id)
+
+    if format == "ndjson":
+        return StreamingResponse(_ndjson_lines(rows), media_type="application/x-ndjson")
+    if format == "csv":
+        return StreamingResponse(
+            _csv_lines(rows),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=appointments.csv"},
         )
-    return result
+
+    # Rows already have the PatientAppointmentOut shape and types
+    return FastJSONResponse(content=list(rows))
 
 #Appointment Booking
 @router.post("/book-appointment")
@@ -230,12 +420,11 @@ def book_appointment(
 
     patient.apptStatus = "scheduled"
     patient.appointment_datetime = request.scheduled_datetime
+    # email notification, sent by the outbox worker after commit
+    queue_appointment_email(db, patient.email, patient.name, request.scheduled_datetime)
     db.commit()
     db.refresh(patient)
 
-    # email notification
-    send_appointment_email(patient.email, patient.name, request.scheduled_datetime)
-
     return {
         "message": "Appointment scheduled successfully",
         "apptStatus": patient.apptStatus,
@@ -244,27 +433,7 @@ def book_appointment(
 
 
 #Dashboard stats
-@router.get("/dashboard/stats")
-def get_dashboard_stats(
-    district: str,
-    db: Session = Depends(get_db)
-) -> Dict:
-
-
-    #Total healthcare providers in that district
-    total_providers = (
-        db.query(Insurer)
-        .filter(Insurer.district == district)
-        .count()
-    )
-
-    #Patients in the given district
-    patients_in_district = (
-        db.query(Patient)
-        .filter(Patient.district == district)
-        .count()
-    )
-
+def _district_adequacy(district: str, total_providers: int, patients_in_district: int) -> Dict:
     #Adequacy (1 provider = 15 patients)
     max_capacity = total_providers * 15
     is_adequate = patients_in_district <= max_capacity
@@ -291,3 +460,21 @@ def get_dashboard_stats(
         "note": note,
         "is_adequate": is_adequate,
     }
+
+
+@router.get("/dashboard/stats")
+def get_dashboard_stats(
+    district: str,
+    db: Session = Depends(get_db)
+) -> Dict:
+    total_providers, patients_in_district = get_district_counts(db, district)
+    return _district_adequacy(district, total_providers, patients_in_district)
+
+
+#All districts
+@router.get("/dashboard/stats/all")
+def get_all_dashboard_stats(db: Session = Depends(get_db)) -> List[Dict]:
+    return [
+        _district_adequacy(district, total_providers, patients_in_district)
+        for district, total_providers, patients_in_district in get_all_district_counts(db)
+    ]
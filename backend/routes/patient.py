@@ -1,17 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 import uuid
 
 from database import get_db
 from models import Patient, Application, Insurer
-from auth import get_current_user, create_access_token, verify_password,get_password_hash
+from auth import (
+    get_current_user, create_access_token, hash_password,
+    verify_and_update_password, invalidate_principal
+)
 from schemas import (
     PatientSignup, PatientLogin, PatientToken, PatientUpdateRequest,
     PatientUpdateResponse, UpdateApplicationStatus, AppointmentRequest,
     PatientApplicationOut
 )
-from utils import send_status_email, send_appointment_email
+from district_stats import record_district_change
+from provider_index import providers_in_district
 
 #Router
 router = APIRouter(prefix="/patient", tags=["Patient"])
@@ -19,17 +24,23 @@ router = APIRouter(prefix="/patient", tags=["Patient"])
 
 #Signup
 @router.post("/signup", response_model=PatientToken)
-def patient_signup(user: PatientSignup, db: Session = Depends(get_db)):
-    existing = db.query(Patient).filter(Patient.email == user.email).first()
+async def patient_signup(user: PatientSignup, db: Session = Depends(get_db)):
+    existing = await run_in_threadpool(
+        lambda: db.query(Patient).filter(Patient.email == user.email).first()
+    )
     if existing:
         raise HTTPException(status_code=400, detail="Patient email already registered")
 
-    hashed_pw = get_password_hash(user.password)
+    hashed_pw = await hash_password(user.password)
     new_patient = Patient(**user.dict(exclude={"password"}), password=hashed_pw)
 
-    db.add(new_patient)
-    db.commit()
-    db.refresh(new_patient)
+    def save():
+        db.add(new_patient)
+        record_district_change(db, new_patient.district, patients=1)
+        db.commit()
+        db.refresh(new_patient)
+
+    await run_in_threadpool(save)
 
     token = create_access_token(
         {"sub": new_patient.email, "role": "patient", "id": new_patient.id}
@@ -45,11 +56,23 @@ def patient_signup(user: PatientSignup, db: Session = Depends(get_db)):
 
 #Login
 @router.post("/login", response_model=PatientToken)
-def patient_login(user: PatientLogin, db: Session = Depends(get_db)):
-    patient = db.query(Patient).filter(Patient.email == user.email).first()
-    if not patient or not verify_password(user.password, patient.password):
+async def patient_login(user: PatientLogin, db: Session = Depends(get_db)):
+    patient = await run_in_threadpool(
+        lambda: db.query(Patient).filter(Patient.email == user.email).first()
+    )
+    if not patient:
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+
+    valid, new_hash = await verify_and_update_password(user.password, patient.password)
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
+    # Re-hash transparently when BCRYPT_ROUNDS has changed
+    if new_hash:
+        patient.password = new_hash
+        await run_in_threadpool(db.commit)
+        await run_in_threadpool(db.refresh, patient)
+
     token = create_access_token(
         {"sub": patient.email, "role": "patient", "id": patient.id}
     )
@@ -84,26 +107,41 @@ def update_patient(
     db: Session = Depends(get_db),
     current_user: Patient = Depends(get_current_user)
 ):
-    patient = db.query(Patient).filter(Patient.id == current_user.id).first()
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
-
-    for field, value in update.dict(exclude_unset=True).items():
-        setattr(patient, field, value)
-
-    db.commit()
-    db.refresh(patient)
-
-    return {
-        "id": patient.id,
-        "name": patient.name,
-        "age": patient.age,
-        "gender": patient.gender,
-        "address": patient.address,
-        "district": patient.district,
-        "country": patient.country,
-        "status": patient.status,
+    changes = update.dict(exclude_unset=True)
+    if changes:
+        # The cached principal may be stale on other workers; the district
+        # deltas must use the value the database holds in this transaction
+        old_district = None
+        if "district" in changes:
+            row = db.query(Patient.district).filter(Patient.id == current_user.id).first()
+            if not row:
+                raise HTTPException(status_code=404, detail="Patient not found")
+            old_district = row.district
+        updated = (
+            db.query(Patient)
+            .filter(Patient.id == current_user.id)
+            .update(changes, synchronize_session=False)
+        )
+        if not updated:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        if "district" in changes and changes["district"] != old_district:
+            record_district_change(db, old_district, patients=-1)
+            record_district_change(db, changes["district"], patients=1)
+        db.commit()
+        invalidate_principal("patient", current_user.id)
+
+    patient = {
+        "id": current_user.id,
+        "name": current_user.name,
+        "age": current_user.age,
+        "gender": current_user.gender,
+        "address": current_user.address,
+        "district": current_user.district,
+        "country": current_user.country,
+        "status": current_user.status,
     }
+    patient.update(changes)
+    return patient
 
 
 #Moodscore
@@ -113,18 +151,20 @@ def update_moodscore(
     db: Session = Depends(get_db),
     current_user: Patient = Depends(get_current_user)
 ):
-    patient = db.query(Patient).filter(Patient.id == current_user.id).first()
-    if not patient:
+    updated = (
+        db.query(Patient)
+        .filter(Patient.id == current_user.id)
+        .update({Patient.moodScore: moodscore}, synchronize_session=False)
+    )
+    if not updated:
         raise HTTPException(status_code=404, detail="Patient not found")
-
-    patient.moodScore = moodscore
     db.commit()
-    db.refresh(patient)
+    invalidate_principal("patient", current_user.id)
 
     return {
         "message": "Moodscore saved successfully",
-        "patient_id": patient.id,
-        "moodscore": patient.moodScore
+        "patient_id": current_user.id,
+        "moodscore": moodscore
     }
 
 
@@ -146,23 +186,11 @@ def get_patient_by_id(patient_id: str, db: Session = Depends(get_db)):
 #Providers in district
 @router.get("/{patient_id}/providers")
 def get_providers_by_patient(patient_id: str, db: Session = Depends(get_db)):
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    patient = db.query(Patient.district).filter(Patient.id == patient_id).first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
-    providers = db.query(Insurer).filter(Insurer.district == patient.district).all()
-    return [
-        {
-            "id": p.id,
-            "companyName": p.companyName,
-            "email": p.email,
-            "contactNo": p.contactNo,
-            "address": p.address,
-            "district": p.district,
-            "country": p.country,
-        }
-        for p in providers
-    ]
+    return [p._asdict() for p in providers_in_district(patient.district)]
 
 
 #Apply for provider
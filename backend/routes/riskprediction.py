@@ -1,21 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from sqlalchemy.orm import Session
-import joblib
+from typing import List
 import numpy as np
 from uuid import UUID
 
 from database import get_db
-from models import Patient
-from auth import get_current_user   
+from models import Patient, Insurer, Application
+from auth import get_current_user, invalidate_principal
+from model_registry import risk_model_registry
 
 
 #Router
 router = APIRouter(prefix="/patient", tags=["RiskPrediction"])
 
-model = joblib.load(r"D:\Development\yggdrasil\CTS_finalbe\model\risk_model_hgb.pkl")
-encoders = joblib.load(r"D:\Development\yggdrasil\CTS_finalbe\model\encoders.pkl")
-
 class InputData(BaseModel):
     patient_id: UUID
     age: int
@@ -26,10 +24,39 @@ class InputData(BaseModel):
     emotional_state: str
 
 
-def safe_transform(encoder, value: str):
-    if value not in encoder.classes_:
-        encoder.classes_ = np.append(encoder.classes_, value) 
-    return encoder.transform([value])[0]
+class BatchInputData(BaseModel):
+    items: List[InputData]
+
+    @validator("items")
+    def validate_batch_size(cls, v):
+        if not v:
+            raise ValueError("At least one item is required")
+        if len(v) > 5000:
+            raise ValueError("At most 5000 items can be scored at once")
+        seen = set()
+        for item in v:
+            if item.patient_id in seen:
+                raise ValueError(f"Duplicate patient_id {item.patient_id}")
+            seen.add(item.patient_id)
+        return v
+
+
+def _active_model():
+    try:
+        return risk_model_registry.get()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Risk model unavailable: {e}")
+
+
+def _feature_matrix(tables, items: List[InputData]):
+    return np.column_stack([
+        np.array([data.age for data in items]),
+        tables["Gender"].encode([data.gender for data in items]),
+        np.array([data.mood_score for data in items]),
+        np.array([data.sleep_quality for data in items]),
+        np.array([data.stress_level for data in items]),
+        tables["Emotional_State"].encode([data.emotional_state for data in items]),
+    ])
 
 
 #Riskprediction
@@ -39,35 +66,96 @@ def predict_and_store_risk(
     db: Session = Depends(get_db),
     current_user: Patient = Depends(get_current_user)
 ):
+    loaded = _active_model()
     try:
-        gender_encoded = safe_transform(encoders["Gender"], data.gender)
-        emotion_encoded = safe_transform(encoders["Emotional_State"], data.emotional_state)
-
-        X = np.array([[
-            data.age,
-            gender_encoded,
-            data.mood_score,
-            data.sleep_quality,
-            data.stress_level,
-            emotion_encoded
-        ]])
-
-        prediction = model.predict(X)[0]
-
-        patient = db.query(Patient).filter(Patient.id == current_user.id).first()
-        if not patient:
-            raise HTTPException(status_code=404, detail="Patient not found")
+        prediction = loaded.model.predict(_feature_matrix(loaded.tables, [data]))[0]
 
-        patient.riskLevel = str(prediction)
+        risk_level = str(prediction)
+        updated = (
+            db.query(Patient)
+            .filter(Patient.id == current_user.id)
+            .update({Patient.riskLevel: risk_level}, synchronize_session=False)
+        )
+        if not updated:
+            raise HTTPException(status_code=404, detail="Patient not found")
         db.commit()
-        db.refresh(patient)
+        invalidate_principal("patient", current_user.id)
 
         return {
             "success": True,
             "message": "Risk level predicted and stored successfully",
-            "patient_id": str(patient.id),
-            "riskLevel": patient.riskLevel
+            "patient_id": str(current_user.id),
+            "riskLevel": risk_level,
+            "modelVersion": loaded.version
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+#Batch riskprediction
+@router.post("/riskprediction/batch")
+def predict_and_store_risk_batch(
+    body: BatchInputData,
+    db: Session = Depends(get_db),
+    current_user: Insurer = Depends(get_current_user)
+):
+    """
+    Score many patients with one vectorised predict call and write every
+    riskLevel in a single executemany UPDATE. Insurers can only re-score
+    patients who have applied to them.
+    """
+    if not isinstance(current_user, Insurer):
+        raise HTTPException(status_code=403, detail="Only insurers can run batch risk prediction")
+
+    loaded = _active_model()
+
+    requested_ids = {str(item.patient_id) for item in body.items}
+    existing = {
+        patient_id for (patient_id,) in
+        db.query(Patient.id).filter(Patient.id.in_(list(requested_ids)))
+    }
+    allowed = {
+        patient_id for (patient_id,) in
+        db.query(Application.patient_id)
+        .filter(
+            Application.insurer_id == current_user.id,
+            Application.patient_id.in_(list(requested_ids)),
+        )
+        .distinct()
+    }
+    items = [item for item in body.items if str(item.patient_id) in allowed & existing]
+
+    predictions = {}
+    if items:
+        try:
+            labels = loaded.model.predict(_feature_matrix(loaded.tables, items))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        predictions = {str(item.patient_id): str(label) for item, label in zip(items, labels)}
+
+        db.bulk_update_mappings(Patient, [
+            {"id": patient_id, "riskLevel": risk_level}
+            for patient_id, risk_level in predictions.items()
+        ])
+        db.commit()
+        for patient_id in predictions:
+            invalidate_principal("patient", patient_id)
+
+    results = []
+    for item in body.items:
+        patient_id = str(item.patient_id)
+        if patient_id in predictions:
+            results.append({"patient_id": patient_id, "success": True, "riskLevel": predictions[patient_id]})
+        elif patient_id not in existing:
+            results.append({"patient_id": patient_id, "success": False, "detail": "Patient not found"})
+        else:
+            results.append({"patient_id": patient_id, "success": False, "detail": "Not an applicant of this insurer"})
+
+    return {"scored": len(predictions), "modelVersion": loaded.version, "results": results}
+
+
+#Model info
+@router.get("/riskprediction/model")
+def get_risk_model_info(current_user = Depends(get_current_user)):
+    return risk_model_registry.info()
@@ -1,6 +1,6 @@
 # schemas.py
 from pydantic import BaseModel, EmailStr, validator
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 import re
 
@@ -130,6 +130,28 @@ class UpdateApplicationStatus(BaseModel):
     status: str  
 
 
+class ApplicationDecision(BaseModel):
+    application_id: str
+    status: str
+
+
+class BulkApplicationDecision(BaseModel):
+    decisions: List[ApplicationDecision]
+
+    @validator("decisions")
+    def validate_batch_size(cls, v):
+        if not v:
+            raise ValueError("At least one decision is required")
+        if len(v) > 1000:
+            raise ValueError("At most 1000 decisions can be submitted at once")
+        seen = set()
+        for decision in v:
+            if decision.application_id in seen:
+                raise ValueError(f"Duplicate application_id {decision.application_id}")
+            seen.add(decision.application_id)
+        return v
+
+
 class PatientApplicationOut(BaseModel):
     application_id: str
     patient_id: str
@@ -142,6 +164,12 @@ class PatientApplicationOut(BaseModel):
     applnStatus: Optional[str] = None  
 
 
+class PatientApplicationPage(BaseModel):
+    items: List[PatientApplicationOut]
+    total: int
+    next_cursor: Optional[str] = None
+
+
 #Appointment
 class AppointmentRequest(BaseModel):
     application_id: str
@@ -1,23 +1,41 @@
 # utils.py
-import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-from dotenv import load_dotenv
+from sqlalchemy.orm import Session
 
+from config import settings
+from models import EmailOutbox
 
-load_dotenv()
-EMAIL_USER = os.getenv("EMAIL_USER")
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+
+EMAIL_USER = settings.email_user
+EMAIL_PASSWORD = settings.email_password
+SMTP_SERVER = settings.smtp_server
+SMTP_PORT = settings.smtp_port
+SMTP_STARTTLS = settings.smtp_starttls
+
+
+def queue_email(db: Session, recipient: str, subject: str, body: str):
+    """
+    Add an email to the outbox in the caller's transaction; the outbox
+    worker delivers it once that transaction commits.
+    """
+    db.add(EmailOutbox(recipient=recipient, subject=subject, body=body))
+
+
+def queue_emails(db: Session, messages):
+    """
+    Bulk variant of queue_email for (recipient, subject, body) tuples;
+    written with a single executemany INSERT.
+    """
+    db.bulk_insert_mappings(EmailOutbox, [
+        {"recipient": recipient, "subject": subject, "body": body}
+        for recipient, subject, body in messages
+    ])
 
 
 #Email status
-def send_status_email(patient_email: str, patient_name: str, status: str):
+def status_email(patient_name: str, status: str):
     """
-    Send an email to the patient notifying them about the insurance application status,
+    Build the email notifying the patient about the insurance application status,
     with a warm message encouraging mental health care.
     """
     subject = f"Your Insurance Application has been {status.capitalize()}"
@@ -34,26 +52,14 @@ def send_status_email(patient_email: str, patient_name: str, status: str):
         "Insurer Provider 💙"
     )
 
-    msg = MIMEMultipart()
-    msg["From"] = EMAIL_USER
-    msg["To"] = patient_email
-    msg["Subject"] = subject
-    msg.attach(MIMEText(body, "plain"))
-
-    try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_USER, patient_email, msg.as_string())
-    except Exception as e:
-        print(f"Error sending status email to {patient_email}: {e}")
+    return subject, body
 
 
 
 #Appointment Email
-def send_appointment_email(patient_email: str, patient_name: str, appt_datetime: datetime):
+def appointment_email(patient_name: str, appt_datetime: datetime):
     """
-    Send an email to the patient notifying them about the scheduled appointment,
+    Build the email notifying the patient about the scheduled appointment,
     with a supportive mental health message.
     """
     subject = "Your Mental Health Appointment is Scheduled from your insurer team"
@@ -73,16 +79,14 @@ def send_appointment_email(patient_email: str, patient_name: str, appt_datetime:
         "Insurer Provider 💙"
     )
 
-    msg = MIMEMultipart()
-    msg["From"] = EMAIL_USER
-    msg["To"] = patient_email
-    msg["Subject"] = subject
-    msg.attach(MIMEText(body, "plain"))
-
-    try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_USER, patient_email, msg.as_string())
-    except Exception as e:
-        print(f"Error sending appointment email to {patient_email}: {e}")
+    return subject, body
+
+
+def queue_status_email(db: Session, patient_email: str, patient_name: str, status: str):
+    subject, body = status_email(patient_name, status)
+    queue_email(db, patient_email, subject, body)
+
+
+def queue_appointment_email(db: Session, patient_email: str, patient_name: str, appt_datetime: datetime):
+    subject, body = appointment_email(patient_name, appt_datetime)
+    queue_email(db, patient_email, subject, body)
@@ -20,12 +20,22 @@ function PatientPanel() {
         const token = localStorage.getItem("token");
         if (!token) throw new Error("Authentication token not found.");
 
-        const response = await axios.get(
-          "http://localhost:8000/insurer/patient-applications",
-          { headers: { Authorization: `Bearer ${token}` } }
-        );
-
-        setPatients(response.data);
+        // The endpoint is paginated; follow next_cursor to load every application
+        const applications = [];
+        let cursor = null;
+        do {
+          const response = await axios.get(
+            "http://localhost:8000/insurer/patient-applications",
+            {
+              headers: { Authorization: `Bearer ${token}` },
+              params: { limit: 500, ...(cursor && { cursor }) },
+            }
+          );
+          applications.push(...response.data.items);
+          cursor = response.data.next_cursor;
+        } while (cursor);
+
+        setPatients(applications);
       } catch (err) {
         console.error("Error fetching applications:", err);
         setError("Failed to load applications.");